@@ -0,0 +1,181 @@
+import argparse
+from contextlib import redirect_stdout
+import io
+import json
+import time
+
+import numpy as np
+
+from mesh import Mesh, get_planes, load_obj, project
+from renderer import HEIGHT, WIDTH, SoftwareRenderer, get_edges, to_screen
+
+# main imports OpenGL, so it is only imported by the benchmarks that need it.
+
+
+def make_mesh(count, seed):
+    # A jittered grid, so vertices with close indices are close in space, and triangles between near vertices,
+    # like in meshes exported from modelling tools.
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(count)))
+    index = np.arange(count)
+    vertices = np.stack([index % side, index // side, rng.uniform(0, 1, count)], axis=1) * (100 / side) - 50
+    vertices[:, :2] += rng.uniform(0, 100 / side, (count, 2))
+    first = np.repeat(np.arange(count), 2)
+    faces = first[:, None] + np.stack([np.zeros(2 * count, dtype=int), rng.integers(1, 3, 2 * count),
+                                       side + rng.integers(0, 2, 2 * count)], axis=1)
+    return Mesh(vertices, faces % count)
+
+
+def project_per_vertex(vertices, faces, matrix, offset):
+    from main import Point
+    # The old path: a Point and a 1 x 4 matrix per vertex and a Python level divide, then plane coefficients face
+    # by face.
+    projected = np.zeros((len(vertices), 3))
+    for index, (x, y, z) in enumerate(vertices):
+        point = Point(x + offset[0], y + offset[1], z + offset[2])
+        Ap = np.matmul(point.get_my_matrix(), matrix)
+        if Ap[0, 3] != 0:
+            projected[index] = Ap[0, 0] / Ap[0, 3], Ap[0, 1] / Ap[0, 3], Ap[0, 2] / Ap[0, 3]
+    planes = []
+    for i1, i2, i3 in faces:
+        (x1, y1, z1), (x2, y2, z2), (x3, y3, z3) = (vertices[i].astype(float) + offset for i in (i1, i2, i3))
+        a = (y2 - y1) * (z3 - z1) - (z2 - z1) * (y3 - y1)
+        b = -(x2 - x1) * (z3 - z1) + (z2 - z1) * (x3 - x1)
+        c = (x2 - x1) * (y3 - y1) - (y2 - y1) * (x3 - x1)
+        planes.append((a, b, c, -a * x1 - b * y1 - c * z1))
+    return projected, planes
+
+
+def project_batched(vertices, faces, matrix, offset, projected, planes):
+    project(vertices, matrix, offset, out=projected)
+    get_planes(vertices + offset, faces, out=planes)
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_transform(args):
+    from main import Program
+    matrix = Program().projection_matrix
+    offset = (1.5, -2.0, 3.0)
+    meshes = [(path, load_obj(path)) for path in args.meshes]
+    meshes += [(f"random {count}", make_mesh(count, args.seed)) for count in args.counts]
+    results = []
+    for name, mesh in meshes:
+        vertices = mesh.vertices * np.float32(5)
+        projected = np.empty_like(vertices)
+        planes = np.empty((len(mesh.faces), 4))
+        result = {"mesh": name, "vertices": len(vertices), "faces": len(mesh.faces)}
+        result["batched_ms"] = timed(lambda: project_batched(vertices, mesh.faces, matrix, offset, projected, planes),
+                                     args.repeat)
+        if len(vertices) <= args.per_vertex_limit:
+            result["per_vertex_ms"] = timed(lambda: project_per_vertex(vertices, mesh.faces, matrix, offset), 1)
+            reference, reference_planes = project_per_vertex(vertices, mesh.faces, matrix, offset)
+            result["max_relative_error"] = float(np.abs(reference - projected).max() / np.abs(reference).max())
+            result["max_plane_error"] = float(np.abs(np.array(reference_planes) - planes).max())
+        results.append(result)
+    return results
+
+
+def bench_render(args):
+    meshes = [(path, load_obj(path)) for path in args.meshes]
+    meshes += [(f"random {count}", make_mesh(count, args.seed)) for count in args.counts]
+    renderer = SoftwareRenderer(args.width, args.height)
+    results = []
+    for name, mesh in meshes:
+        # Orthographic view from above, the software renderer does not need a camera to be timed.
+        points = to_screen(mesh.vertices)
+        triangle_edges = np.concatenate([mesh.faces[:, [0, 1]], mesh.faces[:, [1, 2]], mesh.faces[:, [2, 0]]])
+        start = time.perf_counter()
+        edges = get_edges(mesh.faces)
+        edges_ms = (time.perf_counter() - start) * 1000
+
+        def draw(lines):
+            renderer.clear()
+            renderer.draw_lines(points, lines)
+
+        results.append({"mesh": name, "faces": len(mesh.faces), "edges": len(edges), "edges_ms": edges_ms,
+                        "triangles_ms": timed(lambda: draw(triangle_edges), args.repeat),
+                        "edge_list_ms": timed(lambda: draw(edges), args.repeat), "pixels": renderer.pixels})
+    return results
+
+
+def bench_cull(args):
+    from main import Body, Krivulja, Program
+    results = []
+    for path in args.meshes:
+        program = Program()
+        program.body = Body(path)
+        program.krivulja = Krivulja("krivulja.txt")
+        program.renderer = SoftwareRenderer(args.width, args.height)
+        renderer = program.renderer
+        for enabled in (False, True):
+            program.culler.enabled = enabled
+            program.krivulja.distance = 0
+            stats = []
+            times = {"project": 0.0, "cull": 0.0, "draw": 0.0}
+            # The stages of my_display one by one, so culling and drawing are timed apart from the projection.
+            # The curve is projected only on the first frame and reports it, which would end up in the JSON.
+            with redirect_stdout(io.StringIO()):
+                for _ in range(args.steps):
+                    program.body.move(*program.krivulja.get_next_pose())
+                    start = time.perf_counter()
+                    program.calculate_points2()
+                    program.calculate_points()
+                    projected = time.perf_counter()
+                    program.cull()
+                    culled = time.perf_counter()
+                    renderer.clear()
+                    renderer.draw_lines(program.body_points, program.visible_edges)
+                    renderer.draw_points(program.curve_points)
+                    renderer.flush()
+                    drawn = time.perf_counter()
+                    times["project"] += projected - start
+                    times["cull"] += culled - projected
+                    times["draw"] += drawn - culled
+                    stats.append(program.culler.stats)
+            result = {"mesh": path, "culling": enabled}
+            result.update({f"{stage}_ms": total / args.steps * 1000 for stage, total in times.items()})
+            result["frame_ms"] = sum(times.values()) / args.steps * 1000
+            result["faces"] = stats[0]["faces"]
+            for key in ("drawn", "edges", "back", "outside", "clipped"):
+                result[key] = float(np.mean([frame[key] for frame in stats]))
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the 1. lab mesh pipeline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=10)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    transform_parser = subparsers.add_parser("transform", help="per-vertex projection against the batched one")
+    transform_parser.add_argument("--meshes", nargs="*", default=["aircraft747.obj"])
+    transform_parser.add_argument("--counts", type=int, nargs="*", default=[100000, 1000000],
+                                  help="vertex counts of random meshes")
+    transform_parser.add_argument("--per-vertex-limit", type=int, default=20000,
+                                  help="largest mesh the per-vertex path is timed on")
+    transform_parser.set_defaults(run=bench_transform)
+    render_parser = subparsers.add_parser("render", help="software rasterizer with triangle edges against the edge list")
+    render_parser.add_argument("--meshes", nargs="*", default=["aircraft747.obj"])
+    render_parser.add_argument("--counts", type=int, nargs="*", default=[100000, 1000000],
+                               help="vertex counts of random meshes")
+    render_parser.add_argument("--width", type=int, default=WIDTH)
+    render_parser.add_argument("--height", type=int, default=HEIGHT)
+    render_parser.set_defaults(run=bench_render)
+    cull_parser = subparsers.add_parser("cull", help="frames along the curve with and without culling")
+    cull_parser.add_argument("--meshes", nargs="*", default=["aircraft747.obj"])
+    cull_parser.add_argument("--steps", type=int, default=200)
+    cull_parser.add_argument("--width", type=int, default=WIDTH)
+    cull_parser.add_argument("--height", type=int, default=HEIGHT)
+    cull_parser.set_defaults(run=bench_cull)
+    args = parser.parse_args()
+    print(json.dumps(args.run(args), indent=2))
+
+
+if __name__ == '__main__':
+    main()
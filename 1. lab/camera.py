@@ -0,0 +1,118 @@
+import math
+
+import numpy as np
+
+
+class Camera:
+    """View (T) and perspective (P) matrices for an eye (ociste) looking at a point (glediste).
+
+    The matrices are only rebuilt when they are asked for after a change. T depends on both points, P only on
+    the distance H between them. `version` goes up whenever projection_matrix changes, so anything projected
+    with it can tell it is out of date.
+    """
+
+    def __init__(self, ociste, glediste):
+        self._ociste = tuple(map(float, ociste))
+        self._glediste = tuple(map(float, glediste))
+        self.H = self.get_distance()
+        self._T = None
+        self._P = None
+        self._projection_matrix = None
+        self.version = 0
+        self.rebuilt = 0
+
+    @property
+    def ociste(self):
+        return self._ociste
+
+    @ociste.setter
+    def ociste(self, value):
+        self.move(value, self._glediste)
+
+    @property
+    def glediste(self):
+        return self._glediste
+
+    @glediste.setter
+    def glediste(self, value):
+        self.move(self._ociste, value)
+
+    def move(self, ociste, glediste):
+        ociste, glediste = tuple(map(float, ociste)), tuple(map(float, glediste))
+        if ociste == self._ociste and glediste == self._glediste:
+            return
+        self._ociste, self._glediste = ociste, glediste
+        self._T = None
+        H = self.get_distance()
+        if H != self.H:
+            self.H = H
+            self._P = None
+        self._projection_matrix = None
+        self.version += 1
+
+    def translate(self, x, y, z):
+        ox, oy, oz = self._ociste
+        self.ociste = ox + x, oy + y, oz + z
+
+    def get_distance(self):
+        return math.dist(self._ociste, self._glediste)
+
+    @property
+    def T(self):
+        if self._T is None:
+            self._T = self.get_view_transform_matrix()
+            self.rebuilt += 1
+        return self._T
+
+    @property
+    def P(self):
+        if self._P is None:
+            self._P = self.get_perspective_projection_matrix()
+            self.rebuilt += 1
+        return self._P
+
+    @property
+    def projection_matrix(self):
+        if self._projection_matrix is None:
+            self._projection_matrix = np.matmul(self.T, self.P)
+        return self._projection_matrix
+
+    def get_view_transform_matrix(self):
+        ox, oy, oz = self._ociste
+        t1 = np.matrix([[1, 0, 0, 0],
+                        [0, 1, 0, 0],
+                        [0, 0, 1, 0],
+                        [-ox, -oy, -oz, 1]])
+        g1 = np.matmul(np.matrix([*self._glediste, 1.0]), t1)
+        cosa = g1[0, 0] / math.sqrt(g1[0, 0] ** 2 + g1[0, 1] ** 2)
+        sina = g1[0, 1] / math.sqrt(g1[0, 0] ** 2 + g1[0, 1] ** 2)
+        t2 = np.matrix([[cosa, -sina, 0, 0],
+                        [sina, cosa, 0, 0],
+                        [0, 0, 1, 0],
+                        [0, 0, 0, 1]])
+        g2 = np.matmul(g1, t2)
+        sinb = g2[0, 0] / math.sqrt(g2[0, 0] ** 2 + g2[0, 2] ** 2)
+        cosb = g2[0, 2] / math.sqrt(g2[0, 0] ** 2 + g2[0, 2] ** 2)
+        t3 = np.matrix([[cosb, 0, sinb, 0],
+                        [0, 1, 0, 0],
+                        [-sinb, 0, cosb, 0],
+                        [0, 0, 0, 1]])
+        t4 = np.matrix([[0, -1, 0, 0],
+                        [1, 0, 0, 0],
+                        [0, 0, 1, 0],
+                        [0, 0, 0, 1]])
+        t5 = np.matrix([[-1, 0, 0, 0],
+                        [0, 1, 0, 0],
+                        [0, 0, 1, 0],
+                        [0, 0, 0, 1]])
+        t = np.matmul(t1, t2)
+        t = np.matmul(t, t3)
+        t = np.matmul(t, t4)
+        t = np.matmul(t, t5)
+        return t
+
+    def get_perspective_projection_matrix(self):
+        return np.matrix([[1, 0, 0, 0],
+                          [0, 1, 0, 0],
+                          [0, 0, 0, 1 / self.H],
+                          [0, 0, 0, 0]])
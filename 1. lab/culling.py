@@ -0,0 +1,85 @@
+import numpy as np
+
+# Projected coordinates that end up inside the window, see to_screen.
+VIEW = (-75, -25, 105, 155)
+NEAR = 1.0
+
+
+def get_front_faces(planes, eye):
+    # Faces are wound counter-clockwise seen from outside, so the eye is on the positive side of a front face.
+    # Body turns meshes wound the other way around with orient_outward.
+    return planes[:, :3] @ np.asarray(eye, dtype=np.float64) + planes[:, 3] > 0
+
+
+def get_bounding_sphere(vertices):
+    low, high = vertices.min(axis=0), vertices.max(axis=0)
+    center = (low + high) / 2
+    return center, float(np.sqrt(((vertices - center) ** 2).sum(axis=1).max()))
+
+
+OUTSIDE, PARTLY, INSIDE = range(3)
+
+
+def sphere_in_frustum(center, radius, camera):
+    """Whether a sphere in world space is OUTSIDE, PARTLY inside or entirely INSIDE the view, tested in view
+    space against the side planes and the near plane. A point (x, y, z) in view space ends up at x * H / z,
+    y * H / z.
+    """
+    x, y, z, _ = np.asarray(np.matmul([*center, 1.0], camera.T)).ravel()
+    if z + radius < NEAR:
+        return OUTSIDE
+    result = INSIDE if z - radius >= NEAR else PARTLY
+    H = camera.H
+    left, bottom, right, top = VIEW
+    for normal in ((H, 0, -left), (-H, 0, right), (0, H, -bottom), (0, -H, top)):
+        distance = np.dot(normal, (x, y, z)) / np.linalg.norm(normal)
+        if distance < -radius:
+            return OUTSIDE
+        if distance < radius:
+            result = PARTLY
+    return result
+
+
+def get_visible_faces(faces, projected, front):
+    # Front faces whose projected bounding box overlaps the view. x and y are gathered on their own, the
+    # (N x 3 x 3) array of all corners would cost more than the rest of the pass.
+    left, bottom, right, top = VIEW
+    x = projected[:, 0][faces]
+    y = projected[:, 1][faces]
+    inside = np.maximum(np.maximum(x[:, 0], x[:, 1]), x[:, 2]) >= left
+    inside &= np.minimum(np.minimum(x[:, 0], x[:, 1]), x[:, 2]) <= right
+    inside &= np.maximum(np.maximum(y[:, 0], y[:, 1]), y[:, 2]) >= bottom
+    inside &= np.minimum(np.minimum(y[:, 0], y[:, 1]), y[:, 2]) <= top
+    return front & inside
+
+
+class Culler:
+    def __init__(self):
+        self.enabled = True
+        self.stats = dict()
+
+    def cull(self, body, camera):
+        """Mask of the edges to draw and the statistics of this pass."""
+        faces = len(body.faces)
+        center, radius = body.bounds
+        center = (center if body.rotation is None else center @ body.rotation) + body.get_offset()
+        if not self.enabled:
+            visible = np.ones(faces, dtype=bool)
+            stats = {"faces": faces, "outside": 0, "back": 0, "clipped": 0}
+        else:
+            side = sphere_in_frustum(center, radius, camera)
+            if side == OUTSIDE:
+                visible = np.zeros(faces, dtype=bool)
+                stats = {"faces": faces, "outside": faces, "back": 0, "clipped": 0}
+            else:
+                visible = get_front_faces(body.planes, camera.ociste)
+                back = faces - int(np.count_nonzero(visible))
+                # With the whole body in view no face can miss the window, the boxes are only tested otherwise.
+                if side == PARTLY:
+                    visible = get_visible_faces(body.faces, body.vertices, visible)
+                stats = {"faces": faces, "outside": 0, "back": back, "clipped": faces - back - int(visible.sum())}
+        edges = np.zeros(len(body.edges), dtype=bool)
+        edges[body.edge_index[np.tile(visible, 3)]] = True
+        stats.update(drawn=int(visible.sum()), edges=int(edges.sum()))
+        self.stats = stats
+        return edges
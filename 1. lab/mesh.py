@@ -0,0 +1,207 @@
+import os
+
+import numpy as np
+
+BATCH_LINES = 1 << 16
+CACHE_VERSION = 2
+
+
+class Mesh:
+    def __init__(self, vertices, faces):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int32).reshape(-1, 3)
+
+    def __repr__(self):
+        return f"Mesh({len(self.vertices)} vertices, {len(self.faces)} faces)"
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.faces.nbytes
+
+
+class ArrayBuilder:
+    # Appends parsed batches and joins them once, so the text is never held in memory as a whole.
+    def __init__(self, dtype, width):
+        self.dtype = dtype
+        self.width = width
+        self.parts = []
+
+    def append(self, array):
+        if len(array):
+            self.parts.append(np.asarray(array, dtype=self.dtype).reshape(-1, self.width))
+
+    def build(self):
+        if not self.parts:
+            return np.zeros((0, self.width), dtype=self.dtype)
+        return np.concatenate(self.parts)
+
+
+def parse_vertices(lines):
+    # Only x, y and z are used, an optional w is dropped.
+    rows = [line.split()[:3] for line in lines]
+    return np.array(rows, dtype=np.bytes_).astype(np.float32)
+
+
+def parse_faces(lines, vertex_count):
+    # Faces with more than three corners are split into a fan, "v/vt/vn" corners keep only v and negative
+    # indices count back from the last vertex read so far.
+    faces = []
+    counts = []
+    for line in lines:
+        corners = [corner.split(b"/", 1)[0] for corner in line.split()]
+        faces.append(corners)
+        counts.append(len(corners))
+    out, order = [], []
+    counts = np.array(counts)
+    for count in np.unique(counts):
+        if count < 3:
+            continue
+        rows = np.flatnonzero(counts == count)
+        group = np.array([faces[i] for i in rows], dtype=np.bytes_).astype(np.int64)
+        out.append(np.stack([np.repeat(group[:, :1], count - 2, axis=1).ravel(),
+                             group[:, 1:-1].ravel(), group[:, 2:].ravel()], axis=1))
+        order.append(np.repeat(rows, count - 2))
+    if not out:
+        return np.zeros((0, 3), dtype=np.int32)
+    # Back to the order of the file.
+    indices = np.concatenate(out)[np.argsort(np.concatenate(order), kind="stable")]
+    indices = np.where(indices < 0, indices + vertex_count, indices - 1)
+    return indices.astype(np.int32)
+
+
+def parse_obj(path, batch_lines=BATCH_LINES):
+    vertices = ArrayBuilder(np.float32, 3)
+    faces = ArrayBuilder(np.int32, 3)
+    vertex_count = 0
+    vertex_lines, face_lines = [], []
+    with open(path, "rb") as file:
+        for line in file:
+            # Negative face indices count back from the vertices read before the face, so a batch of faces is
+            # parsed before any vertex that comes after it is counted, and the other way around.
+            if line.startswith(b"v "):
+                if face_lines:
+                    faces.append(parse_faces(face_lines, vertex_count))
+                    face_lines = []
+                vertex_lines.append(line[2:])
+            elif line.startswith(b"f "):
+                if vertex_lines:
+                    vertices.append(parse_vertices(vertex_lines))
+                    vertex_count += len(vertex_lines)
+                    vertex_lines = []
+                face_lines.append(line[2:])
+            else:
+                continue
+            if len(vertex_lines) >= batch_lines:
+                vertices.append(parse_vertices(vertex_lines))
+                vertex_count += len(vertex_lines)
+                vertex_lines = []
+            if len(face_lines) >= batch_lines:
+                faces.append(parse_faces(face_lines, vertex_count))
+                face_lines = []
+    if vertex_lines:
+        vertices.append(parse_vertices(vertex_lines))
+        vertex_count += len(vertex_lines)
+    if face_lines:
+        faces.append(parse_faces(face_lines, vertex_count))
+    return Mesh(vertices.build(), faces.build())
+
+
+def get_cache_path(path):
+    return path + ".npz"
+
+
+def load_obj(path, use_cache=True):
+    """Loads an OBJ file as a Mesh, reusing the .npz cache next to it while the file's mtime and size match."""
+    stat = os.stat(path)
+    key = np.array([CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    cache_path = get_cache_path(path)
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cache:
+                if np.array_equal(cache["key"], key):
+                    return Mesh(cache["vertices"], cache["faces"])
+        except (OSError, KeyError, ValueError):
+            pass
+    mesh = parse_obj(path)
+    if use_cache:
+        try:
+            with open(cache_path, "wb") as file:
+                np.savez(file, key=key, vertices=mesh.vertices, faces=mesh.faces)
+        except OSError:
+            pass
+    return mesh
+
+
+def to_homogeneous(vertices, offset=(0, 0, 0)):
+    points = np.empty((len(vertices), 4), dtype=np.float64)
+    np.add(vertices, offset, out=points[:, :3])
+    points[:, 3] = 1
+    return points
+
+
+def project(vertices, matrix, offset=(0, 0, 0), out=None):
+    """Moves all vertices by `offset` and projects them with one (N x 4) x (4 x 4) product.
+
+    Vertices with h = 0 after the projection end up at the origin.
+    """
+    projected = to_homogeneous(vertices, offset) @ np.asarray(matrix)
+    h = projected[:, 3]
+    hidden = h == 0
+    h[hidden] = 1
+    if out is None:
+        out = np.empty((len(vertices), 3), dtype=np.float32)
+    np.divide(projected[:, :3], h[:, None], out=out, casting="same_kind")
+    out[hidden] = 0
+    return out
+
+
+def get_planes(vertices, faces, out=None):
+    # Plane coefficients a, b, c, d of every face, the normal is (p2 - p1) x (p3 - p1).
+    corners = np.asarray(vertices, dtype=np.float64)[faces]
+    p1 = corners[:, 0]
+    u = corners[:, 1] - p1
+    v = corners[:, 2] - p1
+    if out is None:
+        out = np.empty((len(faces), 4), dtype=np.float64)
+    a, b, c, d = out.T
+    np.subtract(u[:, 1] * v[:, 2], u[:, 2] * v[:, 1], out=a)
+    np.subtract(u[:, 2] * v[:, 0], u[:, 0] * v[:, 2], out=b)
+    np.subtract(u[:, 0] * v[:, 1], u[:, 1] * v[:, 0], out=c)
+    np.negative(a * p1[:, 0] + b * p1[:, 1] + c * p1[:, 2], out=d)
+    return out
+
+
+def get_signed_volume(vertices, faces):
+    # Positive when the faces are wound counter-clockwise seen from outside, for a closed mesh.
+    corners = np.asarray(vertices, dtype=np.float64)[faces]
+    return float(np.einsum("ij,ij->", corners[:, 0], np.cross(corners[:, 1], corners[:, 2])) / 6)
+
+
+def orient_outward(mesh):
+    """The mesh with its faces wound counter-clockwise seen from outside, like back-face culling expects.
+
+    Exporters do not agree on the winding, aircraft747.obj is wound clockwise and kocka.obj counter-clockwise,
+    so the faces of a mesh with a negative volume are turned around.
+    """
+    if get_signed_volume(mesh.vertices, mesh.faces) >= 0:
+        return mesh
+    return Mesh(mesh.vertices, mesh.faces[:, [0, 2, 1]])
+
+
+def get_model_matrix(rotation=None, offset=(0, 0, 0)):
+    # Row vector convention like the rest of the lab: v' = v * R + offset.
+    model = np.eye(4)
+    if rotation is not None:
+        model[:3, :3] = rotation
+    model[3, :3] = offset
+    return model
+
+
+def transform_planes(planes, rotation=None, offset=(0, 0, 0), out=None):
+    # Planes of a mesh moved by get_model_matrix(rotation, offset), without touching its vertices.
+    if out is None:
+        out = np.empty_like(planes)
+    normals = planes[:, :3] @ rotation if rotation is not None else planes[:, :3].copy()
+    out[:, 3] = planes[:, 3] - normals @ np.asarray(offset, dtype=np.float64)
+    out[:, :3] = normals
+    return out
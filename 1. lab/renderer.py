@@ -0,0 +1,122 @@
+import numpy as np
+
+WIDTH = 900
+HEIGHT = 900
+
+
+def get_edges(faces, return_index=False):
+    """Every edge once, an edge shared by two triangles is drawn only one time.
+
+    With `return_index` it also returns which of the edges every face side is: first the sides from corner 0 to
+    1 of all faces, then 1 to 2 and then 2 to 0.
+    """
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]).astype(np.int64)
+    edges.sort(axis=1)
+    keys, index = np.unique(edges[:, 0] << 32 | edges[:, 1], return_inverse=True)
+    edges = np.stack([keys >> 32, keys & 0xFFFFFFFF], axis=1).astype(np.uint32)
+    return (edges, index) if return_index else edges
+
+
+def to_screen(points):
+    screen = np.empty((len(points), 2), dtype=np.float32)
+    screen[:, 0] = (75 + points[:, 0]) * 5
+    screen[:, 1] = (25 + points[:, 1]) * 5
+    return screen
+
+
+def clip_lines(start, end, width, height):
+    # Liang-Barsky against [0, width - 1] x [0, height - 1], returns the clipped ends and which lines are left.
+    delta = end - start
+    t0 = np.zeros(len(start))
+    t1 = np.ones(len(start))
+    visible = np.ones(len(start), dtype=bool)
+    for axis, size in ((0, width - 1), (1, height - 1)):
+        d = delta[:, axis]
+        for p, q in ((-d, start[:, axis]), (d, size - start[:, axis])):
+            parallel = p == 0
+            visible &= ~parallel | (q >= 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = q / p
+            t0 = np.where(~parallel & (p < 0), np.maximum(t0, t), t0)
+            t1 = np.where(~parallel & (p > 0), np.minimum(t1, t), t1)
+    visible &= t0 <= t1
+    return start + t0[:, None] * delta, start + t1[:, None] * delta, visible
+
+
+class SoftwareRenderer:
+    """Draws wireframes into a NumPy image, for machines without a display or an OpenGL driver."""
+
+    BATCH_PIXELS = 1 << 20
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+        self.image = np.full((height, width), 255, dtype=np.uint8)
+        self.color = 0
+        self.pixels = 0
+
+    def clear(self):
+        self.image.fill(255)
+        self.pixels = 0
+
+    def plot(self, x, y):
+        # y goes up like in gluOrtho2D, the image rows go down.
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        self.image[self.height - 1 - y[inside], x[inside]] = self.color
+        self.pixels += int(np.count_nonzero(inside))
+
+    def draw_lines(self, points, edges):
+        points = points.astype(np.float64)
+        start, end, visible = clip_lines(points[edges[:, 0]], points[edges[:, 1]], self.width, self.height)
+        start, end = start[visible], end[visible]
+        steps = np.ceil(np.abs(end - start).max(axis=1)).astype(np.int64)
+        # Lines are drawn in batches of about BATCH_PIXELS samples, so long lines can't use up the memory.
+        total = np.cumsum(steps + 1)
+        cuts = np.searchsorted(total, np.arange(self.BATCH_PIXELS, total[-1], self.BATCH_PIXELS)) if len(total) else []
+        for part in np.split(np.arange(len(start)), cuts):
+            if len(part):
+                self.draw_segments(start[part], end[part], steps[part])
+
+    def draw_segments(self, start, end, steps):
+        delta = end - start
+        counts = steps + 1
+        line = np.repeat(np.arange(len(start)), counts)
+        t = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t = t / np.maximum(steps, 1)[line]
+        xy = np.rint(start[line] + delta[line] * t[:, None]).astype(np.int64)
+        self.plot(xy[:, 0], xy[:, 1])
+
+    def draw_points(self, points):
+        xy = np.rint(points).astype(np.int64)
+        self.plot(xy[:, 0], xy[:, 1])
+
+    def flush(self):
+        pass
+
+
+class GLRenderer:
+    """Submits all edges of a frame as one vertex array and one index array."""
+
+    def __init__(self):
+        from OpenGL import GL
+        self.gl = GL
+
+    def clear(self):
+        self.gl.glClear(self.gl.GL_COLOR_BUFFER_BIT)
+
+    def draw_lines(self, points, edges):
+        gl = self.gl
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, np.ascontiguousarray(points, dtype=np.float32))
+        gl.glDrawElements(gl.GL_LINES, edges.size, gl.GL_UNSIGNED_INT, np.ascontiguousarray(edges, dtype=np.uint32))
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+
+    def draw_points(self, points):
+        gl = self.gl
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, np.ascontiguousarray(points, dtype=np.float32))
+        gl.glDrawArrays(gl.GL_POINTS, 0, len(points))
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+
+    def flush(self):
+        self.gl.glFlush()
@@ -1,14 +1,18 @@
 import math
+import os
 import random
+import sys
 from math import acos
 from typing import List, Any
 
-import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 import pygame
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spline import ArcLength, evaluate, load_points
+
 WIDTH = 512
 HEIGHT = 512
 
@@ -111,60 +115,15 @@ class Cestica:
 
 
 class Krivulja:
-    def __init__(self, path):
-        self.starting_points = []
-        self.points = []
-        self.vectors = []
-        self.draw_points = []
-        self.calculated_draw = False
-        self.direction = 1
-        self.current_point = 0
-        self.load_data(path)
-        for i in range(len(self.starting_points) - 3):
-            self.calculate_points(*self.starting_points[i:i + 4])
-
-    def load_data(self, path):
-        with open(path, 'r') as file:
-            for line in file.readlines():
-                line = line.rstrip().split(" ")
-                self.starting_points.append(Vektor3(float(line[0]), float(line[1]), float(line[2])))
-
-    def get_next_point(self):
-        self.current_point += self.direction
-        return self.points[self.current_point % len(self.points)]
-
-    def calculate_points(self, point_0, point_1, point_2, point_3):
-        t = 0
-        Bi3 = 1 / 6 * np.matrix([[-1, 3, -3, 1],
-                                 [3, -6, 3, 0],
-                                 [-3, 0, 3, 0],
-                                 [1, 4, 1, 0]])
-        Rx = np.matrix([[point_0.x],
-                        [point_1.x],
-                        [point_2.x],
-                        [point_3.x]])
-        Ry = np.matrix([[point_0.y],
-                        [point_1.y],
-                        [point_2.y],
-                        [point_3.y]])
-        Rz = np.matrix([[point_0.z],
-                        [point_1.z],
-                        [point_2.z],
-                        [point_3.z]])
-        multiply_point_x = np.matmul(Bi3, Rx)
-        multiply_point_y = np.matmul(Bi3, Ry)
-        multiply_point_z = np.matmul(Bi3, Rz)
-        while t < 1:
-            T3 = np.matrix([t ** 3, t ** 2, t, 1])
-            T2 = np.matrix([3 * t ** 2, 2 * t, 1, 0])
-            self.points.append(Vektor3(float(np.matmul(T3, multiply_point_x)), float(np.matmul(T3, multiply_point_y)),
-                                       float(np.matmul(T3, multiply_point_z))))
-            self.draw_points.append(
-                Vektor3(float(np.matmul(T3, multiply_point_x)), float(np.matmul(T3, multiply_point_y)),
-                        float(np.matmul(T3, multiply_point_z))))
-            self.vectors.append(Vektor3(float(np.matmul(T2, multiply_point_x)), float(np.matmul(T2, multiply_point_y)),
-                                        float(np.matmul(T2, multiply_point_z))))
-            t += 0.02
+    def __init__(self, path, kind="bspline", samples=50):
+        self.starting_points = load_points(path)
+        self.points, self.vectors = evaluate(self.starting_points, kind, samples)
+        self.path = ArcLength(self.starting_points, kind)
+        # On average as fast as one sample every 20 ms, but the same speed along the whole curve.
+        self.speed = self.path.length / (len(self.points) * 0.02)
+
+    def get_point(self, time):
+        return Vektor3(*self.path.position(time * self.speed, "loop"))
 
 
 class SustavCestica:
@@ -190,7 +149,7 @@ class SustavCestica:
 
     def pomakni_izvor(self):
         if self.krivulja:
-            self.izvor.pos = self.krivulja.get_next_point()
+            self.izvor.pos = self.krivulja.get_point(self.current_time / 1000)
 
     def stvori_cestice(self):
         n = random.randint(1, min((self.iteration // 50) + 1, 50))
@@ -0,0 +1,80 @@
+import pygame
+
+
+def load_image(name: str, scale=1):
+    image = pygame.image.load(f"{name}.png")
+    if scale != 1:
+        new_size = image.get_width() * scale, image.get_height() * scale
+        image = pygame.transform.scale(image, new_size)
+    return image.convert_alpha()
+
+
+def get_bbox(mask):
+    bounds = mask.get_bounding_rects()
+    return bounds[0].unionall(bounds[1:])
+
+
+class AssetCache:
+    def __init__(self):
+        self.images = dict()
+        self.frames = dict()
+        self.regions = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_image(self, name, scale=1):
+        key = name, scale
+        try:
+            image = self.images[key]
+            self.hits += 1
+        except KeyError:
+            image = self.images[key] = load_image(name, scale)
+            self.misses += 1
+        return image
+
+    def get_frames(self, name, scale, size, count=8):
+        key = name, scale
+        try:
+            frames = self.frames[key]
+            self.hits += 1
+        except KeyError:
+            sheet = self.get_image(name, scale)
+            unit = size * scale
+            frames = []
+            for idx in range(count):
+                image = sheet.subsurface(idx * unit, 0, unit, unit)
+                mask = pygame.mask.from_surface(image)
+                frames.append((image, mask, get_bbox(mask)))
+            self.frames[key] = frames
+            self.misses += 1
+        return frames
+
+    def get_region(self, name, scale, rect):
+        key = name, scale, tuple(rect)
+        try:
+            region = self.regions[key]
+            self.hits += 1
+        except KeyError:
+            region = self.regions[key] = self.get_image(name, scale).subsurface(rect)
+            self.misses += 1
+        return region
+
+    def sprites(self):
+        for frames in self.frames.values():
+            for image, _, _ in frames:
+                yield image
+        yield from self.regions.values()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        self.images.clear()
+        self.frames.clear()
+        self.regions.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+ASSETS = AssetCache()
@@ -0,0 +1,268 @@
+import argparse
+from itertools import product
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import constants
+from config import configure
+from constants import *
+
+# Modules below read constants when they are imported, so they are imported inside the benchmarks, after
+# `configure` had a chance to change them.
+
+
+def make_program(seed):
+    from main import Program
+    random.seed(seed)
+    program = Program()
+    program.setup_screen()
+    return program
+
+
+def make_opacity(program):
+    from opacity import OpacityGrid
+    sw, sh = program.screen.get_size()
+    opacity = OpacityGrid(sw // cell_size_px, sh // cell_size_px, cell_size_px)
+    for obstacle in program.obstacles:
+        opacity.add_occluder(obstacle)
+    return opacity
+
+
+def player_path(frame):
+    x = 100 + (frame * 3) % (SIZE[0] - 200)
+    y = SIZE[1] // 2 + (frame // 40 % 2) * 120
+    return pygame.Vector2(x, y)
+
+
+def bench_lights(args):
+    from fovcache import FovCache
+    from lights import LightSource, LightManager
+    program = make_program(args.seed)
+    opacity = make_opacity(program)
+    light_surface = pygame.Surface(opacity.tiles.shape[::-1])
+    cast_light = max(1, cast_light_px // cell_size_px)
+    results = []
+    for mode, count in product(args.modes, args.counts):
+        rng = random.Random(args.seed)
+        lights = LightManager(mode, FovCache(args.cache_size))
+        lights.add_light(LightSource(target=program.player))
+        for _ in range(count - 1):
+            cell = rng.randrange(opacity.tiles.shape[1]), rng.randrange(opacity.tiles.shape[0])
+            lights.add_light(LightSource(cell, lamp_radius))
+        recomputed = 0
+        start = time.perf_counter()
+        for frame in range(args.frames):
+            program.player.pos = player_path(frame)
+            lights.update(opacity)
+            lights.draw(light_surface, cast_light)
+            recomputed += lights.recomputed
+        elapsed = time.perf_counter() - start
+        results.append({
+            "mode": mode,
+            "lights": count,
+            "frame_ms": elapsed / args.frames * 1000,
+            "recomputed_per_frame": recomputed / args.frames,
+            "fov_cache": lights.cache.stats(),
+        })
+    return results
+
+
+class ScriptedKeys:
+    # Right, down, right, up, 40 frames each.
+    PHASES = pygame.K_RIGHT, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_UP
+
+    def __init__(self):
+        self.frame = 0
+
+    def __call__(self):
+        return self
+
+    def __getitem__(self, key):
+        return int(key == self.PHASES[self.frame // 40 % len(self.PHASES)])
+
+
+def run_program(args):
+    configure(json.loads(args.config))
+    from main import Program
+    keys = ScriptedKeys()
+    pygame.key.get_pressed = keys
+    program = make_program(args.seed)
+    stages = ("update", "opacity", "visibility", "fov", "fog", "render", "blit", "display")
+    timings = {stage: [] for stage in stages}
+    dirty = 0
+    clock = time.perf_counter
+    start = clock()
+    for frame in range(args.frames):
+        keys.frame = frame
+        pygame.event.pump()
+        t0 = clock()
+        program.update()
+        program.update_camera()
+        t1 = clock()
+        program.opacity.update()
+        t2 = clock()
+        program.update_ghost_visibility()
+        t3 = clock()
+        program.lights.update(program.opacity)
+        t4 = clock()
+        dirty_cells = program.fog.update(program.lights, area=program.view_cells)
+        t5 = clock()
+        render = blit = 0.0
+        dirty_rects = []
+        for cells in dirty_cells:
+            rect = program.to_screen(cells)
+            t6 = clock()
+            program.render(rect)
+            t7 = clock()
+            program.fog.apply(program.screen, cells, rect)
+            t8 = clock()
+            render += t7 - t6
+            blit += t8 - t7
+            dirty_rects.append(rect)
+        t9 = clock()
+        pygame.display.update(dirty_rects)
+        t10 = clock()
+        for stage, elapsed in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, render, blit, t10 - t9)):
+            timings[stage].append(elapsed * 1000)
+        dirty += len(dirty_rects)
+    elapsed = clock() - start
+    program.lights.close()
+    return {
+        "config": {"SIZE": list(constants.SIZE), "WORLD_SIZE": list(constants.WORLD_SIZE), "cell_size_px": constants.cell_size_px,
+                   "light_radius_px": constants.light_radius_px, "ghost_count": constants.ghost_count,
+                   "obstacle_count": constants.obstacle_count, "light_workers": constants.light_workers},
+        "frames": args.frames,
+        "frame_ms": elapsed / args.frames * 1000,
+        "stages": {stage: {"mean_ms": sum(values) / len(values), "max_ms": max(values)}
+                   for stage, values in timings.items()},
+        "dirty_rects_per_frame": dirty / args.frames,
+        "fov_cache": program.lights.cache.stats(),
+        "light_waits": program.lights.waited,
+        "world": program.world.stats(),
+    }
+
+
+def bench_program(args):
+    if args.config is not None:
+        return run_program(args)
+    # Every configuration runs in its own interpreter, so the constants it changes are seen by every module.
+    results = []
+    for size, world_size, cell_size, radius, ghosts, obstacles, workers in product(
+            args.sizes, args.world_sizes, args.cell_sizes, args.light_radii, args.ghosts, args.obstacles,
+            args.light_workers):
+        config = {"SIZE": size, "cell_size_px": cell_size, "light_radius_px": radius, "ghost_count": ghosts,
+                  "obstacle_count": obstacles, "light_workers": workers}
+        if world_size is not None:
+            config["WORLD_SIZE"] = world_size
+        command = [sys.executable, os.path.abspath(__file__), "--seed", str(args.seed), "--frames",
+                   str(args.frames), "program", "--config", json.dumps(config)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        results.append(json.loads(output))
+    return results
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return [int(width), int(height)]
+
+
+def bench_render(args):
+    from main import Ghost, SolidObject, random_in_rect
+    from operator import attrgetter
+    from render import RenderBatcher
+    program = make_program(args.seed)
+    screen = program.screen
+    results = []
+    for count in args.counts:
+        objects = list(program.objects.objects)
+        while len(objects) < count:
+            pos = random_in_rect(pygame.Rect(0, 0, *SIZE))
+            objects.append(Ghost(pos) if len(objects) % 3 else SolidObject(pos))
+        for index, obj in enumerate(objects):
+            obj.opacity = 255 if index % 2 else 128
+        timings = dict()
+        batcher = RenderBatcher()
+        for mode in ("per_object", "batched"):
+            # Like GameObjects.version, changed only when an object is moved.
+            version = 0
+            start = time.perf_counter()
+            for frame in range(args.frames):
+                if frame % 10 == 0:
+                    objects[frame % len(objects)].pos += (0, 1)
+                    version += 1
+                if mode == "per_object":
+                    for obj in sorted(objects, key=attrgetter("rect.bottom")):
+                        obj.render(screen)
+                else:
+                    batcher.render(screen, objects, version=version)
+            timings[mode] = (time.perf_counter() - start) / args.frames * 1000
+        results.append({"objects": count, "per_object_ms": timings["per_object"], "batched_ms": timings["batched"],
+                        "resorts": batcher.resorts})
+    return results
+
+
+def bench_swarm(args):
+    from main import Ghost
+    from swarm import GhostSwarm
+    make_program(args.seed)
+    results = []
+    for count in args.counts:
+        ghosts = [Ghost() for _ in range(count)]
+        swarm = GhostSwarm(Ghost, [Ghost(ghost.pos) for ghost in ghosts], SIZE, args.seed)
+        timings = dict()
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            for ghost in ghosts:
+                ghost.update()
+        timings["per_object"] = (time.perf_counter() - start) / args.frames * 1000
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            swarm.update()
+        timings["swarm"] = (time.perf_counter() - start) / args.frames * 1000
+        results.append({"ghosts": count, "per_object_ms": timings["per_object"], "swarm_ms": timings["swarm"]})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the fog of war demo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=200)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    lights_parser = subparsers.add_parser("lights", help="light stage frame time for a growing number of lights")
+    lights_parser.add_argument("--counts", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    lights_parser.add_argument("--modes", nargs="+", choices=["array", "circles"], default=[light_render_mode])
+    lights_parser.add_argument("--cache-size", type=int, default=fov_cache_size,
+                               help="FOV cache entries, 0 disables caching")
+    lights_parser.set_defaults(run=bench_lights)
+    render_parser = subparsers.add_parser("render", help="per-object blitting against the batched atlas renderer")
+    render_parser.add_argument("--counts", type=int, nargs="+", default=[50, 500, 2000, 5000])
+    render_parser.set_defaults(run=bench_render)
+    swarm_parser = subparsers.add_parser("swarm", help="per-object ghost updates against the vectorized swarm")
+    swarm_parser.add_argument("--counts", type=int, nargs="+", default=[16, 1000, 10000])
+    swarm_parser.set_defaults(run=bench_swarm)
+    program_parser = subparsers.add_parser("program", help="per-stage timings of the whole demo with scripted input")
+    program_parser.add_argument("--sizes", type=parse_size, nargs="+", default=[list(SIZE)], metavar="WxH")
+    program_parser.add_argument("--world-sizes", type=parse_size, nargs="+", default=[None], metavar="WxH",
+                                help="world sizes, the screen size by default")
+    program_parser.add_argument("--cell-sizes", type=int, nargs="+", default=[cell_size_px])
+    program_parser.add_argument("--light-radii", type=int, nargs="+", default=[light_radius_px])
+    program_parser.add_argument("--ghosts", type=int, nargs="+", default=[ghost_count])
+    program_parser.add_argument("--obstacles", type=int, nargs="+", default=[obstacle_count])
+    program_parser.add_argument("--light-workers", type=int, nargs="+", default=[light_workers])
+    program_parser.add_argument("--config", help=argparse.SUPPRESS)
+    program_parser.set_defaults(run=bench_program)
+    args = parser.parse_args()
+    print(json.dumps(args.run(args), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+import constants
+
+
+def configure(config):
+    # Has to run before the other modules are imported, they read the constants when they are.
+    for name, value in config.items():
+        setattr(constants, name, tuple(value) if isinstance(value, list) else value)
+    # Derived the same way as in constants.py.
+    if "WORLD_SIZE" not in config:
+        constants.WORLD_SIZE = constants.SIZE
+    constants.light_radius = int(constants.light_radius_px // constants.cell_size_px)
+    constants.light_radius2 = constants.light_radius ** 2
+    constants.light_radius_px2 = constants.light_radius_px ** 2
+    constants.lamp_radius = int(constants.lamp_radius_px // constants.cell_size_px)
+
+
+def snapshot(names):
+    return {name: list(value) if isinstance(value, tuple) else value
+            for name, value in ((name, getattr(constants, name)) for name in names)}
@@ -10,4 +10,29 @@ cast_light_px = 32
 light_mod_value = 400
 light_radius = int(light_radius_px // cell_size_px)
 light_radius2 = light_radius ** 2
-light_radius_px2 = light_radius_px ** 2
\ No newline at end of file
+light_radius_px2 = light_radius_px ** 2
+fov_backend = "numpy"  # "numpy" or "recursive" (reference implementation)
+lamp_count = 0
+lamp_radius_px = 100
+lamp_radius = int(lamp_radius_px // cell_size_px)
+light_render_mode = "array"  # "array" or "circles"
+spatial_cell_px = 64
+ghost_count = 16
+ghost_swarm = True
+simulation_rate = 60
+render_fps = 60
+max_simulation_steps = 5
+fov_cache_size = 256
+fov_precomputed_dir = None  # e.g. "visibility" to precompute FOV for the static map and memory-map it
+obstacle_count = 36
+profile_enabled = False
+profile_frames = 600
+profile_dump = None  # "profile.csv" or "profile.json", written on exit
+profile_overlay_key = "f3"
+WORLD_SIZE = SIZE  # can be much larger than the screen, the camera follows the player
+chunk_size_px = 640
+chunk_keep_margin = 1  # chunks this far outside the fog window stay loaded
+light_workers = 0  # threads computing lights off the main loop, 0 computes them in order on the main thread
+light_max_staleness = 2  # updates a light may lag behind before the main loop waits for it
+light_falloff = "quadratic"  # see falloff.CURVES
+ghost_falloff = "quadratic"
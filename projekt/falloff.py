@@ -0,0 +1,45 @@
+from functools import lru_cache
+from math import isqrt
+import numpy as np
+
+# Intensity for t = 1 - d2 / radius2, both in [0, 1].
+CURVES = {
+    "linear": lambda t: t,
+    "quadratic": lambda t: -1.0 * t * (t - 2.0),
+    "smoothstep": lambda t: t * t * (3.0 - 2.0 * t),
+}
+
+
+def register_curve(name, curve):
+    CURVES[name] = curve
+    falloff_table.cache_clear()
+
+
+def grid_distances(radius2):
+    # Squared distances of cells strictly inside the radius, which are sums of two squares.
+    squares = np.arange(isqrt(radius2) + 1) ** 2
+    sums = np.add.outer(squares, squares).ravel()
+    present = np.zeros(radius2 + 1, dtype=bool)
+    present[sums[sums < radius2]] = True
+    return present
+
+
+@lru_cache()
+def falloff_table(radius2, low=0, high=255, curve="quadratic", bucket=1):
+    """Integer falloff for every squared distance from 0 to radius2, from high at the center to low at the edge.
+
+    Squared distances are grouped into runs of `bucket`, each taking the value of the farthest cell distance
+    in it, so the light falls off in rings.
+    """
+    curve = CURVES[curve] if isinstance(curve, str) else curve
+    d2 = np.arange(radius2 + 1)
+    if bucket > 1:
+        present = np.flatnonzero(grid_distances(radius2))
+        tokens = d2 // bucket
+        farthest = np.full(tokens[-1] + 1, -1)
+        np.maximum.at(farthest, present // bucket, present)
+        d2 = np.where(farthest[tokens] >= 0, farthest[tokens], d2)
+    values = (curve(1 - d2 / radius2) * (high - low)).astype(int) + low
+    table = np.clip(values, 0, 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
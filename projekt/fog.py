@@ -0,0 +1,127 @@
+from random import randint
+import numpy as np
+import pygame
+from constants import *
+from profiler import PROFILER
+
+
+class FogOfWar:
+    def __init__(self, screen_size, cell_size):
+        self.cell_size = cell_size
+        # Round up so every cell maps onto exactly cell_size x cell_size pixels and dirty areas scale independently.
+        self.size = -(-screen_size[0] // cell_size), -(-screen_size[1] // cell_size)
+        self.blocked_light = max(1, blocked_expose_min_px // cell_size), max(1, blocked_expose_max_px // cell_size)
+        self.unblocked_light = max(1, unblocked_expose_min_px // cell_size), max(1, unblocked_expose_max_px // cell_size)
+        self.cast_light = max(1, cast_light_px // cell_size)
+        # Cells up to `margin` outside the screen can still expose it, so the explored map is padded by that much.
+        self.margin = max(self.blocked_light[1], self.unblocked_light[1])
+        width, height = self.size
+        self.explored = np.zeros((height + 2 * self.margin, width + 2 * self.margin), dtype=np.uint8)
+        self.fog_surface = pygame.Surface(self.size)
+        self.light_surface = pygame.Surface(self.size)
+        self.light_bounds = dict()
+        self.dirty = [pygame.Rect((0, 0), self.size)]
+
+    def reveal(self, light):
+        height, width = light.visible_map.shape
+        left, top = light.origin[0] + self.margin, light.origin[1] + self.margin
+        area = pygame.Rect(left, top, width, height).clip((0, 0), self.explored.shape[::-1])
+        if not area.width or not area.height:
+            return None
+        explored = self.explored[area.top:area.bottom, area.left:area.right]
+        window = slice(area.top - top, area.bottom - top), slice(area.left - left, area.right - left)
+        unexplored = explored == 0
+        blocked = light.blocked_map[window] & unexplored
+        visible = light.visible_map[window] & unexplored & ~blocked
+        revealed = None
+        circle = pygame.draw.circle
+        white = 255, 255, 255
+        self.fog_surface.lock()
+        for cells, (size_min, size_max) in ((blocked, self.blocked_light), (visible, self.unblocked_light)):
+            for y, x in zip(*np.nonzero(cells)):
+                size = randint(size_min, size_max)
+                explored[y, x] = size
+                point = x + area.left - self.margin, y + area.top - self.margin
+                circle(self.fog_surface, white, point, size)
+                rect = pygame.Rect(point[0] - size, point[1] - size, 2 * size + 1, 2 * size + 1)
+                revealed = rect if revealed is None else revealed.union(rect)
+        self.fog_surface.unlock()
+        return revealed
+
+    def splat_bounds(self, light):
+        height, width = light.visible_map.shape
+        return pygame.Rect(light.origin[0] - self.cast_light, light.origin[1] - self.cast_light,
+                           width + 2 * self.cast_light, height + 2 * self.cast_light)
+
+    def update(self, lights, moving=True, area=None):
+        # Dirty cells are only redrawn inside `area`, the part of the fog that is on screen.
+        dirty = self.dirty
+        for light in list(self.light_bounds):
+            if light not in lights.lights:
+                dirty.append(self.light_bounds.pop(light))
+        for light in lights.lights:
+            bounds = self.splat_bounds(light)
+            old_bounds = self.light_bounds.get(light)
+            self.light_bounds[light] = bounds
+            if light in lights.changed:
+                with PROFILER.scope("fog.reveal"):
+                    revealed = self.reveal(light)
+                if revealed is not None:
+                    dirty.append(revealed)
+                if old_bounds is not None and old_bounds != bounds:
+                    dirty.append(old_bounds)
+                dirty.append(bounds)
+            elif light.target is not None and moving:
+                # Moving objects are only ever shown inside the light that follows one.
+                dirty.append(bounds)
+        self.dirty = []
+
+        if area is None:
+            area = pygame.Rect((0, 0), self.size)
+        merged = []
+        for rect in dirty:
+            rect = rect.clip(area)
+            if not rect.width or not rect.height:
+                continue
+            overlapping = rect.collidelistall(merged)
+            for index in reversed(overlapping):
+                rect.union_ip(merged.pop(index))
+            merged.append(rect)
+        if not merged:
+            return merged
+
+        with PROFILER.scope("fog.light"):
+            lights.draw(self.light_surface, self.cast_light, area)
+        for rect in merged:
+            self.light_surface.blit(self.fog_surface, rect, rect, special_flags=pygame.BLEND_MULT)
+        return merged
+
+    def mark_dirty(self, rect):
+        size = self.cell_size
+        left, top = rect.left // size, rect.top // size
+        self.dirty.append(pygame.Rect(left, top, -(-rect.right // size) - left, -(-rect.bottom // size) - top))
+
+    def to_pixels(self, cells):
+        return pygame.Rect(cells.x * self.cell_size, cells.y * self.cell_size,
+                           cells.width * self.cell_size, cells.height * self.cell_size)
+
+    def get_state(self, cells):
+        x, y = cells.left + self.margin, cells.top + self.margin
+        explored = self.explored[y:y + cells.height, x:x + cells.width].copy()
+        fog = pygame.surfarray.pixels_red(self.fog_surface)[cells.left:cells.right, cells.top:cells.bottom].T.copy()
+        return explored, fog
+
+    def set_state(self, cells, explored, fog):
+        x, y = cells.left + self.margin, cells.top + self.margin
+        self.explored[y:y + cells.height, x:x + cells.width] = explored
+        pixels = pygame.surfarray.pixels3d(self.fog_surface)
+        pixels[cells.left:cells.right, cells.top:cells.bottom] = fog.T[:, :, None]
+        del pixels
+
+    def apply(self, screen, cells, rect=None):
+        # `rect` is where the cells go on screen, the same place by default.
+        if rect is None:
+            rect = self.to_pixels(cells)
+        light = pygame.transform.scale(self.light_surface.subsurface(cells), rect.size)
+        screen.blit(light, rect, special_flags=pygame.BLEND_RGB_MULT)
+        return rect
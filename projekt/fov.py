@@ -0,0 +1,192 @@
+import numpy as np
+
+
+MULT = [
+    [1, 0, 0, -1, -1, 0, 0, 1],
+    [0, 1, -1, 0, 0, -1, 1, 0],
+    [0, 1, 1, 0, 0, -1, -1, 0],
+    [1, 0, 0, 1, -1, 0, 0, -1],
+]
+
+XX, XY, YX, YY = (np.array(row)[:, None] for row in MULT)
+
+
+def get_visible_points(start_location, get_allows_light, max_distance=30):
+    x, y = start_location
+    line_of_sight = set()
+    line_of_sight.add(start_location)
+    blocked_set = set()
+    distance = dict()
+    distance[start_location] = 0
+    for region in range(8):
+        cast_light(line_of_sight, blocked_set, distance, get_allows_light, x, y, 1, 1, 0, max_distance,
+                   MULT[0][region], MULT[1][region], MULT[2][region], MULT[3][region])
+    return line_of_sight, blocked_set, distance
+
+
+def cast_light(los_cache, blocked_set, distance, get_allows_light, cx, cy, row, start, end, radius, xx, xy, yx, yy):
+    if start < end:
+        return
+    radius_squared = radius ** 2
+    for j in range(row, radius + 1):
+        dx, dy = -j - 1, -j
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            point = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
+            l_slope, r_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+            if start < r_slope:
+                continue
+            elif end > l_slope:
+                break
+            else:
+                d = dx ** 2 + dy ** 2
+                if d < radius_squared:
+                    los_cache.add(point)
+                    distance[point] = d
+                if blocked:
+                    if not get_allows_light(point):
+                        new_start = r_slope
+                        continue
+                    else:
+                        blocked = False
+                        start = new_start
+                else:
+                    if not get_allows_light(point) and j < radius:
+                        blocked = True
+                        blocked_set.add(point)
+                        distance[point] = d
+                        cast_light(los_cache, blocked_set, distance, get_allows_light, cx, cy, j + 1, start, l_slope, radius,
+                                   xx, xy, yx, yy)
+                        new_start = r_slope
+        if blocked:
+            break
+
+
+def light(fog_tiles, point):
+    try:
+        return fog_tiles[point[1]][point[0]]
+    except IndexError:
+        return False
+
+
+def get_opaque_window(fog_tiles, start_location, radius):
+    # Same lookup as `light`: negative indices wrap around, anything else outside the grid blocks light.
+    cx, cy = start_location
+    height, width = fog_tiles.shape
+    xs = np.arange(cx - radius, cx + radius + 1)
+    ys = np.arange(cy - radius, cy + radius + 1)
+    inside_x = (xs >= -width) & (xs < width)
+    inside_y = (ys >= -height) & (ys < height)
+    window = np.ones((len(ys), len(xs)), dtype=bool)
+    window[np.ix_(inside_y, inside_x)] = ~fog_tiles[np.ix_(ys[inside_y] % height, xs[inside_x] % width)]
+    return window
+
+
+def get_visible_arrays(start_location, fog_tiles, max_distance=30):
+    """Row-batched shadowcasting over all eight octants at once.
+
+    Gives the same cells as `get_visible_points`, but as (2r+1, 2r+1) arrays indexed [y, x] around the start
+    location. `distance` holds the squared distance of every visible or blocked cell and -1 elsewhere.
+    """
+    radius = max_distance
+    size = 2 * radius + 1
+    opaque = get_opaque_window(fog_tiles, start_location, radius)
+    visible = np.zeros((size, size), dtype=bool)
+    blocked = np.zeros((size, size), dtype=bool)
+    distance = np.full((size, size), -1, dtype=np.int32)
+    visible[radius, radius] = True
+    distance[radius, radius] = 0
+
+    # Every pending slope window of the recursive version, as (octant, start, end) rows.
+    octants = np.arange(8)
+    starts = np.ones(8)
+    ends = np.zeros(8)
+    for j in range(1, radius + 1):
+        if not len(octants):
+            break
+        dx = np.arange(-j, 1)
+        dy = -j
+        l_slope = (dx - 0.5) / (dy + 0.5)
+        r_slope = (dx + 0.5) / (dy - 0.5)
+        d = dx ** 2 + dy ** 2
+        lx = radius + dx * XX + dy * XY
+        ly = radius + dx * YX + dy * YY
+
+        lit = (r_slope <= starts[:, None]) & (l_slope >= ends[:, None])
+        ii, cc = np.nonzero(lit & (d < radius ** 2))
+        wy, wx = ly[octants[ii], cc], lx[octants[ii], cc]
+        visible[wy, wx] = True
+        distance[wy, wx] = d[cc]
+        if j == radius:
+            break
+
+        hit = lit & opaque[ly, lx][octants]
+        before = np.zeros_like(hit)
+        before[:, 1:] = hit[:, :-1]
+        after = np.zeros_like(hit)
+        after[:, :-1] = hit[:, 1:]
+        si, sc = np.nonzero(hit & ~before)
+        ei, ec = np.nonzero(hit & ~after)
+
+        wy, wx = ly[octants[si], sc], lx[octants[si], sc]
+        blocked[wy, wx] = True
+        distance[wy, wx] = d[sc]
+
+        # Each opaque run spawns a child window that starts where the previous run in the same window ended.
+        first_run = np.ones(len(si), dtype=bool)
+        first_run[1:] = si[1:] != si[:-1]
+        prev_end = np.zeros(len(ec), dtype=int)
+        prev_end[1:] = ec[:-1]
+        child_starts = np.where(first_run, starts[si], r_slope[prev_end])
+        child_ends = l_slope[sc]
+        keep = child_starts >= child_ends
+
+        # The window itself carries on to the next row unless its last lit cell is opaque.
+        rows = np.arange(len(octants))
+        last_lit = j - np.argmax(lit[:, ::-1], axis=1)
+        carry = ~(lit.any(axis=1) & hit[rows, last_lit])
+        carry_starts = starts.copy()
+        last_run = np.ones(len(ei), dtype=bool)
+        last_run[:-1] = ei[1:] != ei[:-1]
+        carry_starts[ei[last_run]] = r_slope[ec[last_run]]
+
+        octants = np.concatenate((octants[si][keep], octants[carry]))
+        starts = np.concatenate((child_starts[keep], carry_starts[carry]))
+        ends = np.concatenate((child_ends[keep], ends[carry]))
+
+    origin = start_location[0] - radius, start_location[1] - radius
+    return visible, blocked, distance, origin
+
+
+def arrays_to_points(visible, blocked, distance, origin):
+    ox, oy = origin
+    ys, xs = np.nonzero(visible)
+    line_of_sight = set(zip((xs + ox).tolist(), (ys + oy).tolist()))
+    ys, xs = np.nonzero(blocked)
+    blocked_set = set(zip((xs + ox).tolist(), (ys + oy).tolist()))
+    ys, xs = np.nonzero(distance >= 0)
+    distance_map = dict(zip(zip((xs + ox).tolist(), (ys + oy).tolist()), distance[ys, xs].tolist()))
+    return line_of_sight, blocked_set, distance_map
+
+
+def points_to_arrays(line_of_sight, blocked_set, distance_map, start_location, max_distance):
+    size = 2 * max_distance + 1
+    origin = start_location[0] - max_distance, start_location[1] - max_distance
+    visible = np.zeros((size, size), dtype=bool)
+    blocked = np.zeros((size, size), dtype=bool)
+    distance = np.full((size, size), -1, dtype=np.int32)
+    for cells, points in ((visible, line_of_sight), (blocked, blocked_set)):
+        if points:
+            xs, ys = np.array(list(points)).T
+            cells[ys - origin[1], xs - origin[0]] = True
+    xs, ys = np.array(list(distance_map)).T
+    distance[ys - origin[1], xs - origin[0]] = list(distance_map.values())
+    return visible, blocked, distance, origin
+
+
+def compute_visible_arrays(start_location, fog_tiles, max_distance=30, backend="numpy"):
+    if backend == "recursive":
+        points = get_visible_points(start_location, lambda point: light(fog_tiles, point), max_distance)
+        return points_to_arrays(*points, start_location, max_distance)
+    return get_visible_arrays(start_location, fog_tiles, max_distance)
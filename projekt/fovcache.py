@@ -0,0 +1,166 @@
+from collections import OrderedDict
+import os
+import zlib
+import numpy as np
+from constants import fov_backend, fov_cache_size
+from fov import compute_visible_arrays
+from profiler import PROFILER
+
+
+def ring_distances(radius):
+    ys, xs = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    return (xs ** 2 + ys ** 2).astype(np.int32)
+
+
+class PrecomputedVisibility:
+    """Visible and blocked cells of every origin on a static map, bit-packed into a memory-mapped .npy file.
+
+    Only valid for the exact tiles it was built from; the file name carries their checksum.
+    """
+
+    def __init__(self, path, radius):
+        self.path = path
+        self.radius = radius
+        self.size = 2 * radius + 1
+        self.bits = np.load(path, mmap_mode="r")
+        self.distances = ring_distances(radius)
+        self.hits = 0
+
+    @staticmethod
+    def get_path(directory, tiles, radius):
+        checksum = zlib.crc32(np.packbits(tiles).tobytes()) ^ zlib.crc32(repr(tiles.shape).encode())
+        return os.path.join(directory, f"visibility-{radius}-{checksum:08x}.npy")
+
+    @classmethod
+    def build(cls, path, tiles, radius, backend=fov_backend):
+        height, width = tiles.shape
+        cells = (2 * radius + 1) ** 2
+        bits = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.uint8,
+                                         shape=(height, width, 2, (cells + 7) // 8))
+        for y in range(height):
+            for x in range(width):
+                visible, blocked, _, _ = compute_visible_arrays((x, y), tiles, radius, backend)
+                bits[y, x, 0] = np.packbits(visible)
+                bits[y, x, 1] = np.packbits(blocked)
+        bits.flush()
+        del bits
+        os.replace(path + ".tmp", path)
+        return cls(path, radius)
+
+    @classmethod
+    def open(cls, directory, tiles, radius):
+        path = cls.get_path(directory, tiles, radius)
+        if os.path.exists(path):
+            return cls(path, radius)
+        os.makedirs(directory, exist_ok=True)
+        return cls.build(path, tiles, radius)
+
+    def get(self, cell):
+        x, y = cell
+        height, width = self.bits.shape[:2]
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        self.hits += 1
+        shape = self.size, self.size
+        cells = self.size * self.size
+        visible = np.unpackbits(self.bits[y, x, 0], count=cells).astype(bool).reshape(shape)
+        blocked = np.unpackbits(self.bits[y, x, 1], count=cells).astype(bool).reshape(shape)
+        distance = np.where(visible | blocked, self.distances, -1).astype(np.int32)
+        return visible, blocked, distance, (x - self.radius, y - self.radius)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class FovCache:
+    """LRU cache of FOV results keyed by (cell, radius, opacity version).
+
+    Precomputed maps answer lookups while the opacity grid still has the tiles they were built from.
+    """
+
+    def __init__(self, capacity=fov_cache_size):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.precomputed = dict()
+        self.checked = dict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+
+    def add_precomputed(self, precomputed):
+        self.precomputed[precomputed.radius] = precomputed
+        self.checked.pop(precomputed.radius, None)
+
+    def get_precomputed(self, cell, radius, opacity):
+        precomputed = self.precomputed.get(radius)
+        if precomputed is None:
+            return None
+        version, valid = self.checked.get(radius) or (None, False)
+        if version != opacity.version:
+            # Checksum the tiles once per opacity version rather than on every lookup.
+            valid = PrecomputedVisibility.get_path(os.path.dirname(precomputed.path), opacity.tiles,
+                                                   radius) == precomputed.path
+            self.checked[radius] = opacity.version, valid
+        return precomputed.get(cell) if valid else None
+
+    def lookup(self, cell, radius, opacity):
+        key = cell, radius, opacity.version
+        entries = self.entries
+        try:
+            result = entries[key]
+        except KeyError:
+            pass
+        else:
+            entries.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = self.get_precomputed(cell, radius, opacity)
+        if result is not None:
+            self.store(cell, radius, opacity.version, result)
+        return result
+
+    def store(self, cell, radius, version, result):
+        for array in result[:3]:
+            # Shared between every light that hits this entry.
+            array.flags.writeable = False
+        if not self.capacity:
+            return
+        entries = self.entries
+        entries[cell, radius, version] = result
+        self.nbytes += sum(array.nbytes for array in result[:3])
+        while len(entries) > self.capacity:
+            _, evicted = entries.popitem(last=False)
+            self.nbytes -= sum(array.nbytes for array in evicted[:3])
+            self.evictions += 1
+
+    def get(self, cell, radius, opacity):
+        result = self.lookup(cell, radius, opacity)
+        if result is None:
+            with PROFILER.scope("fov"):
+                result = compute_visible_arrays(cell, opacity.tiles, radius, fov_backend)
+            self.store(cell, radius, opacity.version, result)
+        return result
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "evictions": self.evictions,
+            "bytes": self.nbytes,
+            "precomputed_hits": sum(precomputed.hits for precomputed in self.precomputed.values()),
+            "precomputed_bytes": sum(precomputed.nbytes for precomputed in self.precomputed.values()),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,234 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+import pygame
+from constants import cell_size_px, light_radius, light_mod_value, explored_value, light_render_mode, fov_backend, \
+    light_workers, light_max_staleness, light_falloff
+from falloff import falloff_table
+from fov import compute_visible_arrays
+from fovcache import FovCache
+
+
+def light_value_map(visible, distance, radius2, explored_value=explored_value, light_mod_value=light_mod_value):
+    table = falloff_table(radius2, explored_value, 255, light_falloff, light_mod_value)
+    value_map = np.zeros(visible.shape, dtype=np.uint8)
+    value_map[visible] = table[distance[visible]]
+    return value_map
+
+
+@lru_cache()
+def splat_offsets(radius):
+    # Taken from pygame.draw.circle itself so the array renderer covers exactly the same cells.
+    size = 2 * radius + 3
+    stamp = pygame.Surface((size, size))
+    pygame.draw.circle(stamp, (255, 255, 255), (radius + 1, radius + 1), radius)
+    xs, ys = np.nonzero(pygame.surfarray.array2d(stamp))
+    return list(zip((ys - radius - 1).tolist(), (xs - radius - 1).tolist()))
+
+
+def splat(value_map, radius):
+    height, width = value_map.shape
+    out = np.zeros((height + 2 * radius, width + 2 * radius), dtype=np.uint8)
+    for dy, dx in splat_offsets(radius):
+        area = out[radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+        np.maximum(area, value_map, out=area)
+    return out
+
+
+def compute_light(cell, tiles, radius, cast_light_radius=None):
+    # Everything a light needs from one FOV computation; runs on the worker threads.
+    arrays = compute_visible_arrays(cell, tiles, radius, fov_backend)
+    value_map = light_value_map(arrays[0], arrays[2], radius ** 2)
+    light_splat = splat(value_map, cast_light_radius) if cast_light_radius is not None else None
+    return arrays, value_map, light_splat
+
+
+class LightSource:
+    def __init__(self, pos=None, radius=light_radius, target=None):
+        self.pos = pos
+        self.radius = radius
+        self.target = target
+        self.cell = None
+        self.version = None
+        self.origin = None
+        self.visible_map = None
+        self.blocked_map = None
+        self.distance_map = None
+        self.value_map = None
+        self.splat = None
+
+    def get_cell(self, origin=(0, 0)):
+        # Relative to `origin`, the world cell the opacity grid starts at.
+        if self.target is None:
+            x, y = self.pos
+        else:
+            x, y = self.target.rect.center
+            x, y = x // cell_size_px, y // cell_size_px
+        return x - origin[0], y - origin[1]
+
+    def bounds(self):
+        x, y = self.cell
+        return pygame.Rect(x - self.radius, y - self.radius, 2 * self.radius + 1, 2 * self.radius + 1)
+
+    def is_stale(self, opacity):
+        if self.version is None or self.cell != self.get_cell(opacity.origin):
+            return True
+        changes = opacity.changed_since(self.version)
+        if changes is None:
+            return True
+        if self.bounds().collidelist(changes) != -1:
+            return True
+        self.version = opacity.version
+        return False
+
+    def compute(self, opacity, cache):
+        cell = self.get_cell(opacity.origin)
+        self.apply(cell, opacity.version, cache.get(cell, self.radius, opacity))
+
+    def apply(self, cell, version, arrays, value_map=None, light_splat=None):
+        self.cell = cell
+        self.version = version
+        self.visible_map, self.blocked_map, self.distance_map, self.origin = arrays
+        if value_map is None:
+            value_map = light_value_map(self.visible_map, self.distance_map, self.radius ** 2)
+        self.value_map = value_map
+        self.splat = light_splat
+
+    def get_splat(self, cast_light_radius):
+        if self.splat is None:
+            self.splat = splat(self.value_map, cast_light_radius)
+        return self.splat
+
+
+class LightManager:
+    """Keeps every light's FOV and light map up to date with the opacity grid.
+
+    With `workers`, cache misses are computed on a thread pool and lights keep showing their last finished
+    result for at most `max_staleness` updates before the main loop waits for them. Without workers everything
+    runs in `update`, in light order.
+    """
+
+    def __init__(self, render_mode=light_render_mode, cache=None, workers=light_workers,
+                 max_staleness=light_max_staleness):
+        self.lights = []
+        self.render_mode = render_mode
+        self.cache = cache if cache is not None else FovCache()
+        self.changed = []
+        self.recomputed = 0
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="lights") if workers else None
+        self.max_staleness = max_staleness
+        self.pending = dict()
+        self.lag = dict()
+        self.snapshot = None
+        self.cast_light_radius = None
+        self.waited = 0
+
+    def add_light(self, light):
+        self.lights.append(light)
+        return light
+
+    def remove_light(self, light):
+        self.lights.remove(light)
+        self.pending.pop(light, None)
+        self.lag.pop(light, None)
+
+    def invalidate(self):
+        # Results still running on the pool belong to the old grid and are dropped.
+        self.pending.clear()
+        self.lag.clear()
+        for light in self.lights:
+            light.version = None
+
+    def update(self, opacity):
+        if self.pool is None:
+            self.changed = [light for light in self.lights if light.is_stale(opacity)]
+            for light in self.changed:
+                light.compute(opacity, self.cache)
+            self.recomputed = len(self.changed)
+            return
+
+        self.changed = []
+        for light in self.lights:
+            if light in self.pending and self.pending[light][0].done():
+                self.finish(light)
+            if light not in self.pending and light.is_stale(opacity):
+                self.request(light, opacity)
+            if light in self.pending:
+                lag = self.lag[light] = self.lag.get(light, 0) + 1
+                # A light without a result for the current grid has nothing it could show meanwhile.
+                if light.version is None or lag > self.max_staleness:
+                    self.waited += 1
+                    self.finish(light)
+        self.recomputed = len(self.changed)
+
+    def request(self, light, opacity):
+        cell = light.get_cell(opacity.origin)
+        arrays = self.cache.lookup(cell, light.radius, opacity)
+        if arrays is not None:
+            light.apply(cell, opacity.version, arrays)
+            self.changed.append(light)
+            return
+        snapshot = self.snapshot
+        if snapshot is None or snapshot[0] is not opacity or snapshot[1] != opacity.version:
+            # Workers read a copy, the grid itself keeps changing on the main thread.
+            snapshot = self.snapshot = opacity, opacity.version, opacity.tiles.copy()
+        future = self.pool.submit(compute_light, cell, snapshot[2], light.radius, self.cast_light_radius)
+        self.pending[light] = future, cell, opacity.version
+
+    def finish(self, light):
+        future, cell, version = self.pending.pop(light)
+        self.lag.pop(light, None)
+        arrays, value_map, light_splat = future.result()
+        if light_splat is not None and 2 * self.cast_light_radius != len(light_splat) - len(value_map):
+            light_splat = None
+        self.cache.store(cell, light.radius, version, arrays)
+        light.apply(cell, version, arrays, value_map, light_splat)
+        self.changed.append(light)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def draw(self, light_surface, cast_light_radius, area=None):
+        # Only `area` of the light surface is redrawn, all of it by default.
+        self.cast_light_radius = cast_light_radius
+        if area is None:
+            area = light_surface.get_rect()
+        if self.render_mode == "circles":
+            self.draw_circles(light_surface, cast_light_radius, area)
+        else:
+            self.draw_array(light_surface, cast_light_radius, area)
+
+    def draw_circles(self, light_surface, cast_light_radius, area):
+        # Painting every light's cells from dark to bright leaves each cell with the brightest light reaching it.
+        values, xs, ys = [], [], []
+        for light in self.lights:
+            cell_ys, cell_xs = np.nonzero(light.visible_map)
+            values.append(light.value_map[cell_ys, cell_xs])
+            xs.append(cell_xs + light.origin[0])
+            ys.append(cell_ys + light.origin[1])
+        values, xs, ys = np.concatenate(values), np.concatenate(xs), np.concatenate(ys)
+        order = np.argsort(values, kind="stable")
+        explored_color = explored_value, explored_value, explored_value
+        circle = pygame.draw.circle
+        light_surface.set_clip(area)
+        light_surface.lock()
+        light_surface.fill(explored_color)
+        for value, x, y in zip(values[order].tolist(), xs[order].tolist(), ys[order].tolist()):
+            circle(light_surface, (value, value, value), (x, y), cast_light_radius)
+        light_surface.unlock()
+        light_surface.set_clip(None)
+
+    def draw_array(self, light_surface, cast_light_radius, area):
+        light_map = np.full((area.height, area.width), explored_value, dtype=np.uint8)
+        for light in self.lights:
+            values = light.get_splat(cast_light_radius)
+            left = light.origin[0] - cast_light_radius
+            top = light.origin[1] - cast_light_radius
+            cells = pygame.Rect(left, top, values.shape[1], values.shape[0]).clip(area)
+            if not cells.width or not cells.height:
+                continue
+            target = light_map[cells.top - area.top:cells.bottom - area.top, cells.left - area.left:cells.right - area.left]
+            source = values[cells.top - top:cells.bottom - top, cells.left - left:cells.right - left]
+            np.maximum(target, source, out=target)
+        pygame.surfarray.blit_array(light_surface.subsurface(area), np.repeat(light_map.T[:, :, None], 3, axis=2))
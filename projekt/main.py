@@ -1,112 +1,25 @@
-from random import uniform, gauss, choice
-from functools import partial
-from operator import attrgetter
-from random import randint
+import argparse
+import random
+from random import gauss, getrandbits
 import pygame
 from constants import *
-
-
-MULT = [
-    [1, 0, 0, -1, -1, 0, 0, 1],
-    [0, 1, -1, 0, 0, -1, 1, 0],
-    [0, 1, 1, 0, 0, -1, -1, 0],
-    [1, 0, 0, 1, -1, 0, 0, -1],
-]
-
-
-def get_visible_points(start_location, get_allows_light, max_distance=30):
-    x, y = start_location
-    line_of_sight = set()
-    line_of_sight.add(start_location)
-    blocked_set = set()
-    distance = dict()
-    distance[start_location] = 0
-    for region in range(8):
-        cast_light(line_of_sight, blocked_set, distance, get_allows_light, x, y, 1, 1, 0, max_distance,
-                   MULT[0][region], MULT[1][region], MULT[2][region], MULT[3][region])
-    return line_of_sight, blocked_set, distance
-
-
-def cast_light(los_cache, blocked_set, distance, get_allows_light, cx, cy, row, start, end, radius, xx, xy, yx, yy):
-    if start < end:
-        return
-    radius_squared = radius ** 2
-    for j in range(row, radius + 1):
-        dx, dy = -j - 1, -j
-        blocked = False
-        while dx <= 0:
-            dx += 1
-            point = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
-            l_slope, r_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
-            if start < r_slope:
-                continue
-            elif end > l_slope:
-                break
-            else:
-                d = dx ** 2 + dy ** 2
-                if d < radius_squared:
-                    los_cache.add(point)
-                    distance[point] = d
-                if blocked:
-                    if not get_allows_light(point):
-                        new_start = r_slope
-                        continue
-                    else:
-                        blocked = False
-                        start = new_start
-                else:
-                    if not get_allows_light(point) and j < radius:
-                        blocked = True
-                        blocked_set.add(point)
-                        distance[point] = d
-                        cast_light(los_cache, blocked_set, distance, get_allows_light, cx, cy, j + 1, start, l_slope, radius,
-                                   xx, xy, yx, yy)
-                        new_start = r_slope
-        if blocked:
-            break
-
-
-def draw_fog(fog_surface, light_surface, visible, distance, new_points, explored_value, light_radius2, cast_light_radius,light_mod_value):
-    explored_color = explored_value, explored_value, explored_value
-    white = 255, 255, 255
-    circle = pygame.draw.circle
-    fog_surface.lock()
-    light_surface.lock()
-    for point, size in new_points:
-        circle(fog_surface, white, point, size)
-    draw_list = list()
-    for point in visible:
-        draw_list.append((distance[point], point))
-    draw_list.sort(reverse=True)
-    cache = dict()
-    light_surface.fill(explored_color)
-    value_range = 255 - explored_value
-    for d, point in draw_list:
-        token = d // light_mod_value
-        try:
-            color = cache[token]
-        except KeyError:
-            value0 = 1 - (d / light_radius2)
-            value = int(-1.0 * value0 * (value0 - 2.0) * value_range) + explored_value
-            value = min(255, max(0, value))
-            color = value, value, value
-            cache[token] = color
-        circle(light_surface, color, point, cast_light_radius)
-    fog_surface.unlock()
-    light_surface.unlock()
-    light_surface.blit(fog_surface, (0, 0), special_flags=pygame.BLEND_MULT)
-
-
-def light(fog_tiles, point):
-    try:
-        return fog_tiles[point[1]][point[0]]
-    except IndexError:
-        return False
-
-
-def random_in_rect(rect):
+from assets import ASSETS, get_bbox
+from falloff import falloff_table
+from fog import FogOfWar
+from fovcache import PrecomputedVisibility
+from lights import LightSource, LightManager
+from opacity import OpacityGrid
+from profiler import PROFILER, ProfilerOverlay
+from render import RenderBatcher
+from scheduler import FixedTimestep
+from spatial import SpatialHash
+from swarm import GhostSwarm
+from world import World
+
+
+def random_in_rect(rect, rng=random):
     rect = pygame.Rect(rect)
-    return pygame.Vector2(uniform(rect.left, rect.right), uniform(rect.top, rect.bottom))
+    return pygame.Vector2(rng.uniform(rect.left, rect.right), rng.uniform(rect.top, rect.bottom))
 
 
 def from_polar(rho, theta):
@@ -124,22 +37,14 @@ def clamp(value, min_value, max_value):
         return value
 
 
-def load_image(name: str, scale=1):
-    image = pygame.image.load(f"{name}.png")
-    if scale != 1:
-        new_size = image.get_width() * scale, image.get_height() * scale
-        image = pygame.transform.scale(image, new_size)
-    return image.convert_alpha()
-
-
 class GameObject:
     def __init__(self, pos, sprite: pygame.Surface):
         self.pos = pygame.Vector2(pos)
+        self.prev_pos = self.pos
         self.size = pygame.Vector2(sprite.get_size())
         self.sprite = sprite
         self.mask = pygame.mask.from_surface(self.sprite)
-        bounds = self.mask.get_bounding_rects()
-        self.bbox = bounds[0].unionall(bounds[1:])
+        self.bbox = get_bbox(self.mask)
         self.hidden = False
         self.opacity = 255
 
@@ -150,6 +55,11 @@ class GameObject:
     def rect(self):
         return pygame.Rect(self.pos, self.size)
 
+    def get_draw_pos(self, alpha=1.0):
+        if self.prev_pos is self.pos or alpha >= 1.0:
+            return self.pos
+        return self.prev_pos.lerp(self.pos, alpha)
+
     def render(self, screen):
         if not self.hidden:
             self.sprite.set_alpha(self.opacity)
@@ -176,12 +86,7 @@ class MoveableObject(GameObject):
     def get_image(self):
         angle = self.velocity.as_polar()[1]
         idx = int((-angle + 90 + 45 / 2) % 360 / 360 * 8)
-        sheet = load_image(self.SHEET, self.SCALE)
-        unit = self.SIZE * self.SCALE
-        image = sheet.subsurface(idx * unit, 0, unit, unit)
-        self.mask = pygame.mask.from_surface(image)
-        bounds = self.mask.get_bounding_rects()
-        self.bbox = bounds[0].unionall(bounds[1:])
+        image, self.mask, self.bbox = ASSETS.get_frames(self.SHEET, self.SCALE, self.SIZE)[idx]
         return image
 
 
@@ -196,8 +101,8 @@ class Player(MoveableObject):
         self.velocity += self.acceleration
         new_pos = self.pos + self.velocity
         self.sprite = self.get_image()
-        new_pos = pygame.Vector2(clamp(new_pos.x, 0, SIZE[0] - self.rect.width),
-                                 clamp(new_pos.y, 0, SIZE[1] - self.rect.height))
+        new_pos = pygame.Vector2(clamp(new_pos.x, 0, WORLD_SIZE[0] - self.rect.width),
+                                 clamp(new_pos.y, 0, WORLD_SIZE[1] - self.rect.height))
         self.pos = new_pos
 
 
@@ -208,7 +113,7 @@ class Ghost(MoveableObject):
 
     def __init__(self, pos=None):
         if pos is None:
-            pos = random_in_rect(pygame.Rect(0, 0, *SIZE))
+            pos = random_in_rect(pygame.Rect(0, 0, *WORLD_SIZE))
         super().__init__(pos)
         self.goal = self.new_goal()
 
@@ -217,7 +122,7 @@ class Ghost(MoveableObject):
         return self.rect.center + direction
 
     def update(self):
-        middle_area = pygame.Rect(0, 0, *SIZE).inflate(-30, -30)
+        middle_area = pygame.Rect(0, 0, *WORLD_SIZE).inflate(-30, -30)
         while self.rect.collidepoint(self.goal) or not middle_area.collidepoint(self.goal):
             self.goal = self.new_goal()
 
@@ -226,8 +131,8 @@ class Ghost(MoveableObject):
         self.velocity += self.acceleration
         new_pos = self.pos + self.velocity
         self.sprite = self.get_image()
-        new_pos = pygame.Vector2(clamp(new_pos.x, 0, SIZE[0] - self.rect.width),
-                                 clamp(new_pos.y, 0, SIZE[1] - self.rect.height))
+        new_pos = pygame.Vector2(clamp(new_pos.x, 0, WORLD_SIZE[0] - self.rect.width),
+                                 clamp(new_pos.y, 0, WORLD_SIZE[1] - self.rect.height))
         self.pos = new_pos
 
 
@@ -242,36 +147,62 @@ class SolidObject(GameObject):
     ]
     SCALE = 3
 
-    def __init__(self, pos, collision_rect=None):
-        sheet = load_image("tileset", self.SCALE)
+    def __init__(self, pos, collision_rect=None, rng=random):
+        sheet = ASSETS.get_image("tileset", self.SCALE)
         sheet.set_colorkey(0xFFFFFF)
-        rect = choice(self.SHEET_RECT)
+        rect = rng.choice(self.SHEET_RECT)
         rect = [x * self.SCALE for x in rect]
         self.collision_rect = collision_rect
-        super().__init__(pos, sheet.subsurface(rect))
+        super().__init__(pos, ASSETS.get_region("tileset", self.SCALE, rect))
 
     @classmethod
-    def generate_many(cls, nb=16, max_tries=1000):
+    def get_max_size(cls):
+        return max(w for _, _, w, _ in cls.SHEET_RECT) * cls.SCALE, max(h for _, _, _, h in cls.SHEET_RECT) * cls.SCALE
+
+    @classmethod
+    def generate_many(cls, nb=16, max_tries=1000, area=None, rng=random, bounds=None):
+        # Positions are taken from `area` and with `bounds`, objects are kept entirely inside them.
         objects = []
+        index = SpatialHash(spatial_cell_px)
         tries = 0
         while len(objects) < nb and tries < max_tries:
-            pos = random_in_rect(pygame.Rect(120, 120, *SIZE))
-            obj = cls(pos)
-            if not any(obj.rect.colliderect(other.rect) for other in objects):
+            tries += 1
+            pos = random_in_rect(area or pygame.Rect(120, 120, *SIZE), rng)
+            obj = cls(pos, rng=rng)
+            if bounds is not None and not bounds.contains(obj.rect):
+                continue
+            if not index.query_rect(obj.rect):
                 objects.append(obj)
+                index.insert(obj)
         return objects
 
 
 class GameObjects:
     def __init__(self):
         self.objects = []
+        self.index = SpatialHash(spatial_cell_px)
+        # Changes when objects are added or removed or one of them changes depth, for the render batcher.
+        self.version = 0
 
     def add_object(self, obj):
         self.objects.append(obj)
+        self.index.insert(obj)
+        self.version += 1
+
+    def remove_object(self, obj):
+        self.objects.remove(obj)
+        self.index.remove(obj)
+        self.version += 1
 
     def update(self):
+        index = self.index
         for obj in self.objects:
+            obj.prev_pos = obj.pos
+            bottom = obj.rect.bottom
             obj.update()
+            index.move(obj)
+            if obj.rect.bottom != bottom:
+                self.version += 1
 
     def render(self, screen):
         for obj in self.objects:
@@ -279,129 +210,270 @@ class GameObjects:
 
 
 class Program:
-    def __init__(self):
+    def __init__(self, seed=None):
+        # Everything random in the game comes from the random module, so a seed fixes the whole session.
+        if seed is not None:
+            random.seed(seed)
+        self.seed = seed
         pygame.init()
         self.screen = pygame.display.set_mode(SIZE)
+        self.preload()
         self.running = True
         self.clock = pygame.time.Clock()
+        self.max_fps = render_fps
+        self.scheduler = FixedTimestep(simulation_rate, max_simulation_steps)
+        self.recorder = None
         self.objects = GameObjects()
+        self.batcher = RenderBatcher()
+        self.batcher.atlas.add_images(ASSETS.sprites())
+        self.opacity = None
+        self.fog = None
+        self.world = World(WORLD_SIZE, chunk_size_px, cell_size_px, getrandbits(32), self.generate_chunk)
+        self.camera = None
+        self.window = None
+        self.view_cells = None
         self.player = Player((100, 100))
-        self.ghosts = [Ghost() for _ in range(16)]
+        self.ghosts = [Ghost() for _ in range(ghost_count)]
         self.objects.add_object(self.player)
-        self.obstacles = SolidObject.generate_many(36)
-        for ghost in self.ghosts:
-            self.objects.add_object(ghost)
-        for obstacle in self.obstacles:
-            self.objects.add_object(obstacle)
+        self.swarm = None
+        if ghost_swarm:
+            self.swarm = GhostSwarm(Ghost, self.ghosts, WORLD_SIZE, getrandbits(32))
+        else:
+            for ghost in self.ghosts:
+                self.objects.add_object(ghost)
+        self.visible_ghosts = set(self.ghosts)
+        self.lights = LightManager()
+        self.lights.add_light(LightSource(target=self.player))
+        self.lamps = []
+        for _ in range(lamp_count):
+            x, y = random_in_rect(pygame.Rect(0, 0, *WORLD_SIZE))
+            self.lamps.append(LightSource((int(x) // cell_size_px, int(y) // cell_size_px), lamp_radius))
+
+    @property
+    def obstacles(self):
+        # Obstacles on a seam are in more than one chunk.
+        return list(dict.fromkeys(obstacle for key in sorted(self.world.chunks)
+                                  for obstacle in self.world.chunks[key].obstacles))
+
+    @staticmethod
+    def generate_chunk(rect, rng):
+        # obstacle_count is per screen worth of area. A chunk cut off by the world edge can be too small to place
+        # anything from, the obstacles of its neighbours still reach into it.
+        width, height = SolidObject.get_max_size()
+        if rect.width < width or rect.height < height:
+            return []
+        count = round(obstacle_count * rect.width * rect.height / (SIZE[0] * SIZE[1]))
+        return SolidObject.generate_many(count, area=rect, rng=rng, bounds=pygame.Rect((0, 0), WORLD_SIZE))
+
+    @staticmethod
+    def preload():
+        for cls in (Player, Ghost):
+            ASSETS.get_frames(cls.SHEET, cls.SCALE, cls.SIZE)
+        sheet = ASSETS.get_image("tileset", SolidObject.SCALE)
+        sheet.set_colorkey(0xFFFFFF)
+        for rect in SolidObject.SHEET_RECT:
+            ASSETS.get_region("tileset", SolidObject.SCALE, [x * SolidObject.SCALE for x in rect])
 
     def update(self):
         self.objects.update()
-
-    def render(self):
+        if self.swarm is not None:
+            self.swarm.update()
+
+    def update_ghost_visibility(self):
+        x1, y1 = self.player.rect.center
+        visible_ghosts = set()
+        table = falloff_table(light_radius_px2, curve=ghost_falloff)
+        if self.swarm is not None:
+            index, d2 = self.swarm.within((x1, y1), light_radius_px2)
+            self.swarm.sync(index)
+            for i, value in zip(index.tolist(), table[d2.astype(int)].tolist()):
+                ghost = self.ghosts[i]
+                ghost.hidden = False
+                ghost.opacity = value
+                visible_ghosts.add(ghost)
+        else:
+            for ghost in self.objects.index.query_radius((x1, y1), light_radius_px):
+                if not isinstance(ghost, Ghost):
+                    continue
+                x2, y2 = ghost.rect.center
+                d2 = (x1 - x2) ** 2 + (y1 - y2) ** 2
+                ghost.hidden = False
+                ghost.opacity = int(table[d2])
+                visible_ghosts.add(ghost)
+        for ghost in self.visible_ghosts - visible_ghosts:
+            ghost.hidden = True
+        self.visible_ghosts = visible_ghosts
+
+    def get_motion(self, alpha):
+        movers = [self.player, *(ghost for ghost in self.visible_ghosts if not ghost.hidden)]
+        return {obj: tuple(map(int, obj.get_draw_pos(alpha))) for obj in movers}
+
+    def render(self, area=None, alpha=1.0):
+        self.screen.set_clip(area)
         self.screen.fill((102, 183, 108))
-        for obj in sorted(self.objects.objects, key=attrgetter("rect.bottom")):
-            obj.render(self.screen)
+        extra = self.visible_ghosts if self.swarm is not None else ()
+        world_area = (area or self.screen.get_rect()).move(self.camera)
+        self.batcher.render(self.screen, self.objects.objects, world_area, extra, alpha, self.camera,
+                            self.objects.version)
+        self.screen.set_clip(None)
+
+    def setup_screen(self):
+        self.update_camera(rebuild=True)
+
+    def update_camera(self, rebuild=False):
+        # Returns True when the fog window moved, which throws away all light state.
+        width, height = self.screen.get_size()
+        x, y = self.player.rect.center
+        x = clamp(x - width // 2, 0, max(0, WORLD_SIZE[0] - width))
+        y = clamp(y - height // 2, 0, max(0, WORLD_SIZE[1] - height))
+        camera = x - x % cell_size_px, y - y % cell_size_px
+        if camera == self.camera and not rebuild:
+            return False
+        self.camera = camera
+        view = pygame.Rect(camera, (width, height))
+        # The window has to hold everything the player's light can reach from inside the view.
+        reach = light_radius_px + blocked_expose_max_px + cast_light_px
+        window = self.world.get_window(view.inflate(2 * reach, 2 * reach))
+        rebuild = rebuild or window != self.window
+        if rebuild:
+            self.setup_window(window)
+        self.view_cells = self.world.get_cells(view, window.topleft)
+        self.fog.mark_dirty(self.fog.to_pixels(self.view_cells))
+        return rebuild
+
+    def setup_window(self, window):
+        world = self.world
+        if self.window is not None:
+            for key in world.keys_in(self.window):
+                chunk = world.chunks[key]
+                chunk.explored, chunk.fog = self.fog.get_state(world.get_cells(chunk.rect, self.window.topleft))
+        margin = 2 * chunk_keep_margin * world.chunk_size
+        before = self.obstacles
+        world.update(world.keys_in(window.inflate(margin, margin)))
+        after = self.obstacles
+        kept = set(after)
+        for obstacle in before:
+            if obstacle not in kept:
+                self.objects.remove_object(obstacle)
+        kept = set(before)
+        for obstacle in after:
+            if obstacle not in kept:
+                self.objects.add_object(obstacle)
+
+        self.window = window
+        self.fog = FogOfWar(window.size, cell_size_px)
+        origin = window.left // cell_size_px, window.top // cell_size_px
+        self.opacity = OpacityGrid(*self.fog.size, cell_size_px, origin)
+        for key in world.keys_in(window):
+            chunk = world.chunks[key]
+            if chunk.explored is not None:
+                self.fog.set_state(world.get_cells(chunk.rect, window.topleft), chunk.explored, chunk.fog)
+        movers = {self.player, *self.ghosts}
+        for obj in self.objects.index.query_rect(window):
+            if obj not in movers:
+                self.opacity.add_occluder(obj)
+
+        window_cells = world.get_cells(window, (0, 0))
+        for lamp in self.lamps:
+            inside = window_cells.collidepoint(lamp.pos)
+            if inside and lamp not in self.lights.lights:
+                self.lights.add_light(lamp)
+            elif not inside and lamp in self.lights.lights:
+                self.lights.remove_light(lamp)
+        self.lights.invalidate()
+        # Cached FOV results are relative to the old window.
+        self.lights.cache.clear()
+        if fov_precomputed_dir is not None:
+            for radius in {light.radius for light in self.lights.lights}:
+                self.lights.cache.add_precomputed(
+                    PrecomputedVisibility.open(fov_precomputed_dir, self.opacity.tiles, radius))
+
+    def to_screen(self, cells):
+        return self.fog.to_pixels(cells.move(-self.view_cells.left, -self.view_cells.top))
+
+    def to_window(self, rect):
+        return rect.move(self.fog.to_pixels(self.view_cells).topleft)
 
     def mainloop(self):
-        new_points = set()
-        cast_light = None
-        blocked_light_min = None
-        blocked_light_max = None
-        unblocked_light_min = None
-        unblocked_light_max = None
         old_screen = None
-        work_surface = None
-        fog_tiles = None
-        fog_table = None
-        fog_surface = None
-        light_surface = None
+        overlay = ProfilerOverlay(PROFILER)
+        motion = None
 
         while self.running:
             if pygame.event.get(pygame.QUIT):
                 self.running = False
+            for event in pygame.event.get(pygame.KEYDOWN):
+                if pygame.key.name(event.key) == profile_overlay_key:
+                    overlay.toggle()
 
-            sw, sh = self.screen.get_size()
-            stw = sw // cell_size_px
-            sth = sh // cell_size_px
-
+            refresh = False
             if old_screen is not self.screen:
                 old_screen = self.screen
-                fog_size = sw // cell_size_px, sh // cell_size_px
-                work_surface = pygame.surface.Surface((sw, sh))
-                fog_surface = pygame.surface.Surface(fog_size)
-                light_surface = pygame.surface.Surface(fog_size)
-                blocked_light_min = max(1, blocked_expose_min_px // cell_size_px)
-                blocked_light_max = max(1, blocked_expose_max_px // cell_size_px)
-                unblocked_light_min = max(1, unblocked_expose_min_px // cell_size_px)
-                unblocked_light_max = max(1, unblocked_expose_max_px // cell_size_px)
-                cast_light = max(1, cast_light_px // cell_size_px)
-                fog_table = dict()
-                fog_tiles = list()
-                for y in range(0, sth * cell_size_px, cell_size_px):
-                    row = list()
-                    fog_tiles.append(row)
-                    for x in range(0, stw * cell_size_px, cell_size_px):
-                        row.append(False)
-
-            self.update()
-
-            for row in fog_tiles:
-                for x in range(len(row)):
-                    row[x] = True
-            for obj in self.objects.objects:
-                if obj is self.player or obj in self.ghosts:
-                    continue
-                rect = obj.bbox.move(obj.rect.topleft)
-                left = rect.left // cell_size_px
-                top = rect.top // cell_size_px
-                right = rect.right // cell_size_px
-                bottom = rect.bottom // cell_size_px
-                for y in range(top, bottom + 1):
-                    for x in range(left, right + 1):
-                        try:
-                            fog_tiles[y][x] = False
-                        except IndexError:
-                            pass
-
-            x1, y1 = self.player.rect.center
-            for ghost in self.ghosts:
-                x2, y2 = ghost.rect.center
-                d2 = (x1 - x2) ** 2 + (y1 - y2) ** 2
-                if d2 < light_radius_px2:
-                    opacity = 1 - (d2 / light_radius_px2)
-                    opacity = int(-1.0 * opacity * (opacity - 2.0) * 255)
-                    opacity = min(255, max(0, opacity))
-                    ghost.hidden = False
-                    ghost.opacity = opacity
-                else:
-                    ghost.hidden = True
-
-            px = self.player.rect.centerx // cell_size_px
-            py = self.player.rect.centery // cell_size_px
-            visible, blocked, distance = get_visible_points((px, py), partial(light, fog_tiles), light_radius)
-
-            new_points.clear()
-            for point in blocked:
-                if point not in fog_table:
-                    size = randint(blocked_light_min, blocked_light_max)
-                    fog_table[point] = size
-                    new_points.add((point, size))
-            for point in visible:
-                if point not in fog_table:
-                    size = randint(unblocked_light_min, unblocked_light_max)
-                    fog_table[point] = size
-                    new_points.add((point, size))
-
-            draw_fog(fog_surface, light_surface, visible, distance, new_points, explored_value, light_radius2, cast_light, light_mod_value)
-
-            self.render()
-            pygame.transform.scale(light_surface, work_surface.get_size(), work_surface)
-            self.screen.blit(work_surface, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
-            pygame.display.flip()
+                self.setup_screen()
+                refresh = True
+
+            steps = self.scheduler.advance(pygame.time.get_ticks())
+            if self.recorder is not None:
+                self.recorder.record(self, steps, self.scheduler.alpha)
+            with PROFILER.scope("update"):
+                for _ in range(steps):
+                    self.update()
+                if steps:
+                    refresh = self.update_camera() or refresh
+
+            # Nothing the light depends on can change without a simulation step, but lights computed on the
+            # pool can finish at any time.
+            if steps or refresh or self.lights.pending:
+                with PROFILER.scope("lights"):
+                    self.opacity.update()
+                    self.update_ghost_visibility()
+                    self.lights.update(self.opacity)
+            else:
+                # Lights changed by the last update were already revealed and redrawn by the fog.
+                self.lights.changed = []
+                self.lights.recomputed = 0
+
+            alpha = self.scheduler.alpha
+            new_motion = self.get_motion(alpha)
+            moving = new_motion != motion
+            motion = new_motion
+
+            for rect in overlay.update():
+                self.fog.mark_dirty(self.to_window(rect))
+            with PROFILER.scope("fog"):
+                dirty_cells = self.fog.update(self.lights, moving, self.view_cells)
+            dirty_rects = []
+            for cells in dirty_cells:
+                rect = self.to_screen(cells)
+                with PROFILER.scope("render"):
+                    self.render(rect, alpha)
+                with PROFILER.scope("blit"):
+                    self.fog.apply(self.screen, cells, rect)
+                dirty_rects.append(rect)
+            overlay_rect = overlay.draw(self.screen)
+            if overlay_rect is not None:
+                dirty_rects.append(overlay_rect)
+            with PROFILER.scope("display"):
+                pygame.display.update(dirty_rects)
+            PROFILER.end_frame()
             pygame.display.set_caption(f"{self.clock.get_fps():.2f}")
-            self.clock.tick(60)
+            self.clock.tick(self.max_fps)
+
+        self.lights.close()
+        if self.recorder is not None:
+            self.recorder.save(self)
+        if profile_dump is not None:
+            PROFILER.dump(profile_dump)
 
 
 if __name__ == '__main__':
-    p = Program()
+    parser = argparse.ArgumentParser(description="Fog of war demo")
+    parser.add_argument("--record", metavar="FILE", help="record the session for replay.py")
+    args = parser.parse_args()
+    if args.record:
+        from replay import Recorder
+        p = Program(getrandbits(64))
+        p.recorder = Recorder(args.record, p.seed)
+    else:
+        p = Program()
     p.mainloop()
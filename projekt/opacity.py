@@ -0,0 +1,66 @@
+from collections import deque
+import numpy as np
+import pygame
+
+
+class OpacityGrid:
+    HISTORY = 256
+
+    def __init__(self, width, height, cell_size, origin=(0, 0)):
+        self.cell_size = cell_size
+        # World cell of tiles[0, 0].
+        self.origin = origin
+        self.tiles = np.ones((height, width), dtype=bool)
+        self.coverage = np.zeros((height, width), dtype=np.int32)
+        self.occluders = dict()
+        self.dynamic = set()
+        self.version = 0
+        self.changes = deque(maxlen=self.HISTORY)
+
+    def cells_of(self, obj):
+        rect = obj.bbox.move(obj.rect.topleft).move(-self.origin[0] * self.cell_size, -self.origin[1] * self.cell_size)
+        height, width = self.tiles.shape
+        left = max(0, rect.left // self.cell_size)
+        top = max(0, rect.top // self.cell_size)
+        right = min(width, rect.right // self.cell_size + 1)
+        bottom = min(height, rect.bottom // self.cell_size + 1)
+        return pygame.Rect(left, top, max(0, right - left), max(0, bottom - top))
+
+    def add_occluder(self, obj, dynamic=False):
+        cells = self.cells_of(obj)
+        self.occluders[obj] = cells
+        if dynamic:
+            self.dynamic.add(obj)
+        self.cover(cells, 1)
+
+    def remove_occluder(self, obj):
+        cells = self.occluders.pop(obj)
+        self.dynamic.discard(obj)
+        self.cover(cells, -1)
+
+    def update(self):
+        for obj in self.dynamic:
+            cells = self.cells_of(obj)
+            old_cells = self.occluders[obj]
+            if cells != old_cells:
+                self.occluders[obj] = cells
+                self.cover(old_cells, -1)
+                self.cover(cells, 1)
+
+    def cover(self, cells, amount):
+        if not cells.width or not cells.height:
+            return
+        rows = slice(cells.top, cells.bottom)
+        columns = slice(cells.left, cells.right)
+        self.coverage[rows, columns] += amount
+        self.tiles[rows, columns] = self.coverage[rows, columns] == 0
+        self.version += 1
+        self.changes.append((self.version, cells))
+
+    def changed_since(self, version):
+        # None means the history no longer reaches back that far and everything has to be treated as changed.
+        if version == self.version:
+            return []
+        if not self.changes or self.changes[0][0] > version + 1:
+            return None
+        return [cells for v, cells in self.changes if v > version]
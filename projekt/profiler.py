@@ -0,0 +1,154 @@
+import csv
+import json
+from time import perf_counter
+import numpy as np
+import pygame
+from constants import profile_enabled, profile_frames
+
+
+class NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.current[self.index] += perf_counter() - self.start
+        return False
+
+
+class Profiler:
+    """Per-frame stage timings in a ring buffer of the last `size` frames.
+
+    Scopes with the same name add up within a frame. While disabled, `scope` hands out a shared no-op scope.
+    """
+
+    MAX_STAGES = 32
+
+    def __init__(self, size=profile_frames, enabled=profile_enabled):
+        self.size = size
+        self.enabled = enabled
+        self.names = []
+        self.scopes = dict()
+        self.samples = np.zeros((size, self.MAX_STAGES))
+        self.current = [0.0] * self.MAX_STAGES
+        self.frames = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        try:
+            return self.scopes[name]
+        except KeyError:
+            scope = self.scopes[name] = Scope(self, len(self.names))
+            self.names.append(name)
+            return scope
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.samples[self.frames % self.size] = self.current
+        self.current[:] = [0.0] * self.MAX_STAGES
+        self.frames += 1
+
+    def recent(self):
+        # Milliseconds, oldest frame first.
+        if self.frames > self.size:
+            rows = np.roll(self.samples, -(self.frames % self.size), axis=0)
+        else:
+            rows = self.samples[:self.frames]
+        return rows[:, :len(self.names)] * 1000
+
+    def summary(self):
+        samples = self.recent()
+        if not len(samples):
+            return dict()
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99), axis=0)
+        mean = samples.mean(axis=0)
+        return {name: {"mean_ms": mean[i], "p50_ms": p50[i], "p95_ms": p95[i], "p99_ms": p99[i]}
+                for i, name in enumerate(self.names)}
+
+    def dump(self, path):
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(self.names)
+                writer.writerows(self.recent().tolist())
+        else:
+            with open(path, "w") as file:
+                json.dump({"frames": self.frames, "stages": self.summary()}, file, indent=2)
+
+
+class ProfilerOverlay:
+    POS = 8, 8
+    REFRESH = 30
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.visible = False
+        self.font = None
+        self.surface = None
+        self.rect = pygame.Rect(self.POS, (0, 0))
+        self.updated = None
+        self.was_enabled = profiler.enabled
+
+    def toggle(self):
+        # The overlay needs timings while it is shown, afterwards the profiler goes back to how it was.
+        self.visible = not self.visible
+        if self.visible:
+            self.was_enabled = self.profiler.enabled
+            self.profiler.enabled = True
+            self.updated = None
+        else:
+            self.profiler.enabled = self.was_enabled
+
+    def update(self):
+        # Returns the screen areas that need redrawing under the overlay.
+        if not self.visible:
+            return [self.rect] if self.surface is not None else []
+        frames = self.profiler.frames
+        if self.updated is not None and frames - self.updated < self.REFRESH:
+            return []
+        self.updated = frames
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        lines = ["stage        p50    p95    p99"]
+        for name, stats in self.profiler.summary().items():
+            lines.append(f"{name:<10} {stats['p50_ms']:6.2f} {stats['p95_ms']:6.2f} {stats['p99_ms']:6.2f}")
+        images = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(image.get_width() for image in images) + 8
+        height = sum(image.get_height() for image in images) + 8
+        surface = pygame.Surface((width, height))
+        y = 4
+        for image in images:
+            surface.blit(image, (4, y))
+            y += image.get_height()
+        old_rect = self.rect
+        self.surface = surface
+        self.rect = pygame.Rect(self.POS, surface.get_size())
+        return [old_rect.union(self.rect)]
+
+    def draw(self, screen):
+        if not self.visible:
+            self.surface = None
+            return None
+        screen.blit(self.surface, self.rect)
+        return self.rect
+
+
+PROFILER = Profiler()
@@ -0,0 +1,120 @@
+from heapq import merge
+from operator import attrgetter
+import pygame
+
+
+class Atlas:
+    WIDTH = 1024
+
+    def __init__(self):
+        self.images = []
+        self.regions = dict()
+        self.views = dict()
+        self.surface = None
+
+    def add_images(self, images):
+        new_images = [image for image in images if image not in self.regions]
+        if new_images:
+            self.images.extend(new_images)
+            self.pack()
+
+    def pack(self):
+        # Shelf packing, tallest images first.
+        regions = dict()
+        x = y = shelf_height = 0
+        for image in sorted(self.images, key=lambda image: image.get_height(), reverse=True):
+            width, height = image.get_size()
+            if x + width > self.WIDTH:
+                x, y = 0, y + shelf_height
+                shelf_height = 0
+            regions[image] = pygame.Rect(x, y, width, height)
+            x += width
+            shelf_height = max(shelf_height, height)
+        self.surface = pygame.Surface((self.WIDTH, y + shelf_height), pygame.SRCALPHA).convert_alpha()
+        self.surface.fill((0, 0, 0, 0))
+        for image, rect in regions.items():
+            # Copy pixels as they are, with color keyed pixels turned fully transparent.
+            source = image.convert_alpha()
+            colorkey = image.get_colorkey()
+            if colorkey is not None:
+                pixels = pygame.surfarray.pixels3d(source)
+                alpha = pygame.surfarray.pixels_alpha(source)
+                alpha[(pixels == colorkey[:3]).all(axis=2)] = 0
+                del pixels, alpha
+            self.surface.blit(source, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        self.regions = regions
+        self.views.clear()
+
+    def get_view(self, image, alpha):
+        key = image, alpha
+        try:
+            return self.views[key]
+        except KeyError:
+            view = self.views[key] = self.surface.subsurface(self.regions[image])
+            view.set_alpha(alpha)
+            return view
+
+
+class RenderBatcher:
+    def __init__(self):
+        self.atlas = Atlas()
+        self.objects = None
+        self.count = 0
+        self.order = []
+        self.depths = []
+        self.ordered = []
+        self.version = None
+        self.resorts = 0
+
+    def sort(self, objects, version=None):
+        # With a `version` that the owner of `objects` changes whenever one of them changes depth, the order is
+        # kept until it changes, otherwise the depths are compared every frame.
+        changed = objects is not self.objects or len(objects) != self.count
+        if changed:
+            self.objects = objects
+            self.count = len(objects)
+            self.order = list(range(len(objects)))
+            self.depths = []
+            self.atlas.add_images(obj.sprite for obj in objects)
+        if version is not None:
+            if changed or version != self.version:
+                depths = [obj.rect.bottom for obj in objects]
+                self.order.sort(key=lambda index: (depths[index], index))
+                self.ordered = [objects[index] for index in self.order]
+                self.version = version
+                self.resorts += 1
+            return self.ordered
+        depths = [obj.rect.bottom for obj in objects]
+        if depths != self.depths:
+            # Ties keep list order, like sorted(); the previous order is nearly sorted already.
+            self.order.sort(key=lambda index: (depths[index], index))
+            self.depths = depths
+            self.resorts += 1
+        return [objects[index] for index in self.order]
+
+    def render(self, screen, objects, area=None, extra=(), alpha=1.0, offset=(0, 0), version=None):
+        # `extra` objects change from frame to frame and are merged into the cached order by depth.
+        # `area` is in world coordinates, `offset` is the world position of the screen's top left corner.
+        regions = self.atlas.regions
+        sprites = [obj.sprite for obj in objects] + [obj.sprite for obj in extra]
+        if any(sprite not in regions for sprite in sprites):
+            self.atlas.add_images(sprites)
+            regions = self.atlas.regions
+        atlas = self.atlas.surface
+        ordered = self.sort(objects, version)
+        if extra:
+            depth = attrgetter("rect.bottom")
+            ordered = merge(sorted(extra, key=depth), ordered, key=depth)
+        ox, oy = offset
+        batch = []
+        for obj in ordered:
+            if obj.hidden or (area is not None and not obj.rect.colliderect(area)):
+                continue
+            pos = obj.get_draw_pos(alpha)
+            if ox or oy:
+                pos = int(pos[0]) - ox, int(pos[1]) - oy
+            if obj.opacity == 255:
+                batch.append((atlas, pos, regions[obj.sprite]))
+            else:
+                batch.append((self.atlas.get_view(obj.sprite, obj.opacity), pos))
+        screen.blits(batch, doreturn=False)
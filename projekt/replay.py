@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import struct
+import time
+import zlib
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+from config import configure, snapshot
+
+# File layout: MAGIC, (version, header length), JSON header, zlib compressed frames.
+# Every frame is three bytes: pressed arrow keys as bits, simulation steps and the interpolation alpha * 255.
+MAGIC = b"PRJREC"
+VERSION = 2
+HEADER = struct.Struct("<HI")
+FRAME = struct.Struct("<BBB")
+KEYS = pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN
+# Everything the generated map and the simulation depend on besides the seed.
+LAYOUT = ("SIZE", "WORLD_SIZE", "cell_size_px", "light_radius_px", "ghost_count", "obstacle_count",
+          "chunk_size_px", "chunk_keep_margin", "lamp_count", "lamp_radius_px", "ghost_swarm", "spatial_cell_px",
+          "blocked_expose_min_px", "blocked_expose_max_px", "unblocked_expose_min_px", "unblocked_expose_max_px",
+          "cast_light_px", "simulation_rate", "max_simulation_steps")
+
+
+def state_hash(program):
+    positions = [tuple(program.player.pos)]
+    positions += sorted(tuple(obstacle.pos) for obstacle in program.obstacles)
+    positions += [tuple(ghost.pos) for ghost in program.ghosts]
+    if program.swarm is not None:
+        positions.append(tuple(program.swarm.pos.ravel().tolist()))
+    checksum = zlib.crc32(repr(positions).encode())
+    if program.fog is not None:
+        checksum = zlib.crc32(program.fog.explored.tobytes(), checksum)
+    return checksum
+
+
+class Recorder:
+    def __init__(self, path, seed):
+        self.path = path
+        self.seed = seed
+        self.frames = bytearray()
+        self.layout = None
+
+    def record(self, program, steps, alpha):
+        if self.layout is None:
+            self.layout = state_hash(program)
+        pressed = pygame.key.get_pressed()
+        keys = sum(1 << i for i, key in enumerate(KEYS) if pressed[key])
+        self.frames += FRAME.pack(keys, steps, round(alpha * 255))
+
+    def save(self, program):
+        header = json.dumps({
+            "seed": self.seed,
+            "constants": snapshot(LAYOUT),
+            "frames": len(self.frames) // FRAME.size,
+            "layout": self.layout,
+            "state": state_hash(program),
+        }).encode()
+        with open(self.path, "wb") as file:
+            file.write(MAGIC)
+            file.write(HEADER.pack(VERSION, len(header)))
+            file.write(header)
+            file.write(zlib.compress(self.frames, 9))
+
+
+def load(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a recording")
+    version, length = HEADER.unpack_from(data, len(MAGIC))
+    if version != VERSION:
+        raise ValueError(f"{path} has version {version}, expected {VERSION}")
+    start = len(MAGIC) + HEADER.size
+    header = json.loads(data[start:start + length])
+    return header, zlib.decompress(data[start + length:])
+
+
+class ReplayKeys:
+    # Stands in for pygame.key.get_pressed().
+    def __init__(self):
+        self.keys = 0
+
+    def __call__(self):
+        return self
+
+    def __getitem__(self, key):
+        return int(key in KEYS and self.keys >> KEYS.index(key) & 1)
+
+
+class ReplayTimestep:
+    # Plays back the recorded steps and alpha in place of FixedTimestep, ignoring the clock.
+    def __init__(self, program, frames, keys):
+        self.program = program
+        self.frames = frames
+        self.keys = keys
+        self.frame = 0
+        self.count = len(frames) // FRAME.size
+        self.alpha = 1.0
+        self.layout = None
+
+    def advance(self, now_ms):
+        if self.layout is None:
+            self.layout = state_hash(self.program)
+        if self.frame >= self.count:
+            self.program.running = False
+            return 0
+        self.keys.keys, steps, alpha = FRAME.unpack_from(self.frames, self.frame * FRAME.size)
+        self.alpha = alpha / 255
+        self.frame += 1
+        if self.frame == self.count:
+            self.program.running = False
+        return steps
+
+
+def replay(path, headless=True):
+    header, frames = load(path)
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    # Worker threads finish lights in a different order every run, which changes how the fog gets revealed.
+    configure(dict(header["constants"], light_workers=0))
+    from main import Program
+    from profiler import PROFILER
+    keys = ReplayKeys()
+    pygame.key.get_pressed = keys
+    PROFILER.enabled = True
+    program = Program(header["seed"])
+    program.scheduler = ReplayTimestep(program, frames, keys)
+    program.max_fps = 0
+    start = time.perf_counter()
+    program.mainloop()
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": program.scheduler.frame,
+        "frame_ms": elapsed / max(1, program.scheduler.frame) * 1000,
+        "layout_matches": program.scheduler.layout == header["layout"],
+        "state_matches": state_hash(program) == header["state"],
+        "stages": PROFILER.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session as fast as possible")
+    parser.add_argument("recording")
+    parser.add_argument("--window", action="store_true", help="show the replay instead of running headless")
+    args = parser.parse_args()
+    print(json.dumps(replay(args.recording, not args.window), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+class FixedTimestep:
+    def __init__(self, rate, max_steps=5):
+        self.step_ms = 1000 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.last = None
+        self.dropped = 0
+
+    def advance(self, now_ms):
+        if self.last is None:
+            self.last = now_ms
+            return 1
+        self.accumulator += now_ms - self.last
+        self.last = now_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            # Falling too far behind: drop the backlog instead of spending every frame catching up.
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step_ms
+        return steps
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.step_ms)
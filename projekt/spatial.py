@@ -0,0 +1,66 @@
+import pygame
+
+
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.buckets = dict()
+        self.spans = dict()
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __contains__(self, obj):
+        return obj in self.spans
+
+    def get_span(self, rect):
+        size = self.cell_size
+        return rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size
+
+    def insert(self, obj):
+        span = self.spans[obj] = self.get_span(obj.rect)
+        for key in self.keys(span):
+            self.buckets.setdefault(key, set()).add(obj)
+
+    def remove(self, obj):
+        for key in self.keys(self.spans.pop(obj)):
+            bucket = self.buckets[key]
+            bucket.discard(obj)
+            if not bucket:
+                del self.buckets[key]
+
+    def move(self, obj):
+        if self.spans[obj] != self.get_span(obj.rect):
+            self.remove(obj)
+            self.insert(obj)
+
+    @staticmethod
+    def keys(span):
+        left, top, right, bottom = span
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                yield x, y
+
+    def query_range(self, rect):
+        # Everything in the buckets touched by `rect`, without an exact overlap test.
+        found = set()
+        buckets = self.buckets
+        for key in self.keys(self.get_span(pygame.Rect(rect))):
+            bucket = buckets.get(key)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def query_rect(self, rect):
+        rect = pygame.Rect(rect)
+        return {obj for obj in self.query_range(rect) if obj.rect.colliderect(rect)}
+
+    def query_radius(self, center, radius):
+        x, y = center
+        radius2 = radius ** 2
+        found = []
+        for obj in self.query_range((x - radius, y - radius, 2 * radius + 1, 2 * radius + 1)):
+            ox, oy = obj.rect.center
+            if (x - ox) ** 2 + (y - oy) ** 2 < radius2:
+                found.append(obj)
+        return found
@@ -0,0 +1,104 @@
+import numpy as np
+import pygame
+from assets import ASSETS
+
+
+class GhostSwarm:
+    """Positions, velocities and goals of many ghosts, stepped together with the same model as `Ghost.update`.
+
+    The `Ghost` objects are only used as sprites; `sync` copies the simulated state into the ones that get drawn.
+    """
+
+    GOAL_DISTANCE = 60
+    GOAL_SPREAD = 30
+    MARGIN = 15
+
+    def __init__(self, cls, ghosts, area_size, seed=None):
+        self.ghosts = list(ghosts)
+        self.area_size = np.array(area_size, dtype=float)
+        self.acceleration = cls.ACCELERATION
+        self.damping = cls.DAMPING
+        self.unit = cls.SIZE * cls.SCALE
+        self.frames = ASSETS.get_frames(cls.SHEET, cls.SCALE, cls.SIZE)
+        self.pos = np.array([ghost.pos for ghost in self.ghosts], dtype=float).reshape(-1, 2)
+        self.velocity = np.array([ghost.velocity for ghost in self.ghosts], dtype=float).reshape(-1, 2)
+        self.goal = np.array([ghost.goal for ghost in self.ghosts], dtype=float).reshape(-1, 2)
+        self.prev_pos = self.pos.copy()
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.ghosts)
+
+    def left_top(self):
+        # pygame.Rect truncates float coordinates towards zero.
+        return np.trunc(self.pos)
+
+    def centers(self):
+        return self.left_top() + self.unit // 2
+
+    def angles(self):
+        return np.degrees(np.arctan2(self.velocity[:, 1], self.velocity[:, 0]))
+
+    def bad_goals(self, gx, gy, left_top):
+        gx, gy = np.trunc(gx), np.trunc(gy)
+        left, top = left_top[:, 0, None], left_top[:, 1, None]
+        inside_self = (gx >= left) & (gx < left + self.unit) & (gy >= top) & (gy < top + self.unit)
+        inside_area = ((gx >= self.MARGIN) & (gx < self.area_size[0] - self.MARGIN) &
+                       (gy >= self.MARGIN) & (gy < self.area_size[1] - self.MARGIN))
+        return inside_self | ~inside_area
+
+    def resample_goals(self, left_top):
+        bad = self.bad_goals(self.goal[:, 0, None], self.goal[:, 1, None], left_top)[:, 0]
+        index = np.flatnonzero(bad)
+        centers = left_top + self.unit // 2
+        angles = self.angles()
+        # Keeping the first good one of several draws is the same as redrawing until one is good, and a few
+        # unlucky ghosts no longer need thousands of rounds.
+        draws = 1
+        while len(index):
+            theta = np.radians(self.rng.normal(angles[index, None], self.GOAL_SPREAD, (len(index), draws)))
+            gx = centers[index, 0, None] + self.GOAL_DISTANCE * np.cos(theta)
+            gy = centers[index, 1, None] + self.GOAL_DISTANCE * np.sin(theta)
+            good = ~self.bad_goals(gx, gy, left_top[index])
+            found = np.flatnonzero(good.any(axis=1))
+            first = good[found].argmax(axis=1)
+            self.goal[index[found], 0] = gx[found, first]
+            self.goal[index[found], 1] = gy[found, first]
+            index = np.delete(index, found)
+            draws = min(draws * 2, 4096)
+
+    def update(self):
+        if not len(self):
+            return
+        self.prev_pos[:] = self.pos
+        left_top = self.left_top()
+        self.resample_goals(left_top)
+        direction = self.goal - (left_top + self.unit // 2)
+        direction /= np.linalg.norm(direction, axis=1)[:, None]
+        self.velocity *= self.damping
+        self.velocity += direction * self.acceleration
+        self.pos += self.velocity
+        np.clip(self.pos, 0, self.area_size - self.unit, out=self.pos)
+
+    def frame_indices(self, index):
+        vx, vy = self.velocity[index].T
+        angle = np.degrees(np.arctan2(vy, vx))
+        return ((-angle + 90 + 45 / 2) % 360 / 360 * 8).astype(int)
+
+    def within(self, center, radius2):
+        d2 = ((self.centers() - center) ** 2).sum(axis=1)
+        index = np.flatnonzero(d2 < radius2)
+        return index, d2[index]
+
+    def sync(self, index):
+        frames = self.frames
+        for i, prev_pos, pos, velocity, goal, frame in zip(index.tolist(), self.prev_pos[index].tolist(),
+                                                           self.pos[index].tolist(), self.velocity[index].tolist(),
+                                                           self.goal[index].tolist(),
+                                                           self.frame_indices(index).tolist()):
+            ghost = self.ghosts[i]
+            ghost.prev_pos = pygame.Vector2(prev_pos)
+            ghost.pos = pygame.Vector2(pos)
+            ghost.velocity = pygame.Vector2(velocity)
+            ghost.goal = pygame.Vector2(goal)
+            ghost.sprite, ghost.mask, ghost.bbox = frames[frame]
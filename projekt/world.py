@@ -0,0 +1,133 @@
+import random
+import zlib
+import numpy as np
+import pygame
+
+
+class Chunk:
+    def __init__(self, key, rect, obstacles):
+        self.key = key
+        self.rect = rect
+        self.obstacles = obstacles
+        # Explored sizes and fog pixels per cell, kept here while the chunk is outside the fog window.
+        self.explored = None
+        self.fog = None
+
+
+class World:
+    """Fixed-size chunks of a world that can be much larger than the screen.
+
+    Chunks are generated from the world seed when they come near the camera, so only their fog state has to be
+    kept once they are evicted, and that is stored compressed.
+
+    Every chunk's seed places the obstacles whose position is inside it, but their rects can reach into the
+    neighbouring chunks, which must not be smaller than an obstacle. Where obstacles of two chunks overlap, the
+    one from the chunk with the smaller key stays. A chunk holds every obstacle that overlaps it, so an obstacle
+    on a seam belongs to more than one chunk.
+    """
+
+    def __init__(self, size, chunk_size, cell_size, seed, generate):
+        self.size = size
+        self.cell_size = cell_size
+        self.chunk_cells = max(1, chunk_size // cell_size)
+        self.chunk_size = self.chunk_cells * cell_size
+        self.columns = -(-size[0] // self.chunk_size)
+        self.rows = -(-size[1] // self.chunk_size)
+        self.seed = seed
+        self.generate = generate
+        self.chunks = dict()
+        self.archive = dict()
+        self.generated_objects = dict()
+        self.placed_objects = dict()
+        self.generated = 0
+        self.evicted = 0
+
+    def get_rect(self, key):
+        x, y = key
+        rect = pygame.Rect(x * self.chunk_size, y * self.chunk_size, self.chunk_size, self.chunk_size)
+        return rect.clip(pygame.Rect((0, 0), self.size))
+
+    def keys_in(self, rect):
+        size = self.chunk_size
+        left, top = max(0, rect.left // size), max(0, rect.top // size)
+        right = min(self.columns - 1, (rect.right - 1) // size)
+        bottom = min(self.rows - 1, (rect.bottom - 1) // size)
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def get_window(self, rect):
+        keys = self.keys_in(rect)
+        window = self.get_rect(keys[0])
+        return window.unionall([self.get_rect(key) for key in keys[1:]])
+
+    def get_cells(self, rect, origin):
+        # Pixel rect to the cells it covers, relative to `origin` in pixels.
+        size = self.cell_size
+        left, top = (rect.left - origin[0]) // size, (rect.top - origin[1]) // size
+        right, bottom = -(-(rect.right - origin[0]) // size), -(-(rect.bottom - origin[1]) // size)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def get_neighbours(self, key, distance=1):
+        x, y = key
+        return [(x + dx, y + dy) for dy in range(-distance, distance + 1) for dx in range(-distance, distance + 1)
+                if 0 <= x + dx < self.columns and 0 <= y + dy < self.rows]
+
+    def get_generated(self, key):
+        # Obstacles from the chunk's seed alone, before the ones overlapping other chunks' obstacles are dropped.
+        objects = self.generated_objects.get(key)
+        if objects is None:
+            x, y = key
+            objects = self.generate(self.get_rect(key), random.Random(f"{self.seed}:{x}:{y}"))
+            self.generated_objects[key] = objects
+            self.generated += 1
+        return objects
+
+    def get_placed(self, key):
+        objects = self.placed_objects.get(key)
+        if objects is None:
+            rivals = [obj for other in self.get_neighbours(key) if other < key for obj in self.get_generated(other)]
+            objects = [obj for obj in self.get_generated(key)
+                       if obj.rect.collidelist([rival.rect for rival in rivals]) < 0]
+            self.placed_objects[key] = objects
+        return objects
+
+    def load(self, key):
+        rect = self.get_rect(key)
+        obstacles = [obj for other in self.get_neighbours(key) for obj in self.get_placed(other)
+                     if obj.rect.colliderect(rect)]
+        chunk = Chunk(key, rect, obstacles)
+        archived = self.archive.pop(key, None)
+        if archived is not None:
+            shape, explored, fog = archived
+            chunk.explored = np.frombuffer(zlib.decompress(explored), dtype=np.uint8).reshape(shape).copy()
+            chunk.fog = np.frombuffer(zlib.decompress(fog), dtype=np.uint8).reshape(shape).copy()
+        self.chunks[key] = chunk
+        return chunk
+
+    def evict(self, key):
+        chunk = self.chunks.pop(key)
+        if chunk.explored is not None and chunk.explored.any():
+            self.archive[key] = (chunk.explored.shape, zlib.compress(chunk.explored.tobytes()),
+                                 zlib.compress(chunk.fog.tobytes()))
+        self.evicted += 1
+        return chunk
+
+    def update(self, keys):
+        keys = set(keys)
+        evicted = [self.evict(key) for key in list(self.chunks) if key not in keys]
+        loaded = [self.load(key) for key in sorted(keys) if key not in self.chunks]
+        # Placed obstacles are kept while a chunk they can reach is loaded, generated ones while they can still
+        # decide what gets placed there.
+        near = {other for key in self.chunks for other in self.get_neighbours(key)}
+        self.placed_objects = {key: objects for key, objects in self.placed_objects.items() if key in near}
+        near = {other for key in self.chunks for other in self.get_neighbours(key, 2)}
+        self.generated_objects = {key: objects for key, objects in self.generated_objects.items() if key in near}
+        return loaded, evicted
+
+    def stats(self):
+        return {
+            "loaded": len(self.chunks),
+            "archived": len(self.archive),
+            "archive_bytes": sum(len(explored) + len(fog) for _, explored, fog in self.archive.values()),
+            "generated": self.generated,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,170 @@
+import numpy as np
+
+# Cubic bases for [t^3, t^2, t, 1] and how many control points the window moves between segments.
+BASES = {
+    "bspline": (np.array([[-1, 3, -3, 1],
+                          [3, -6, 3, 0],
+                          [-3, 0, 3, 0],
+                          [1, 4, 1, 0]]) / 6, 1),
+    "catmull-rom": (np.array([[-1, 3, -3, 1],
+                              [2, -5, 4, -1],
+                              [-1, 0, 1, 0],
+                              [0, 2, 0, 0]]) / 2, 1),
+    "bezier": (np.array([[-1, 3, -3, 1],
+                         [3, -6, 3, 0],
+                         [-3, 3, 0, 0],
+                         [1, 0, 0, 0]]), 3),
+}
+
+
+def load_points(path):
+    return np.loadtxt(path, dtype=np.float64, ndmin=2)[:, :3]
+
+
+def get_windows(points, step):
+    # Control points of every segment as a (segments x 4 x 3) view, nothing is copied.
+    windows = np.lib.stride_tricks.sliding_window_view(points, 4, axis=0)[::step]
+    return windows.transpose(0, 2, 1)
+
+
+def evaluate(points, kind="bspline", samples=50):
+    """Positions and tangents of a cubic curve through `points` as (N x 3) arrays, `samples` per segment.
+
+    Samples are taken at t = 0, 1 / samples, ..., so the end of a segment is the start of the next one.
+    """
+    basis, step = BASES[kind]
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 4:
+        return np.zeros((0, 3)), np.zeros((0, 3))
+    t = np.arange(samples) / samples
+    T = np.stack([t ** 3, t ** 2, t, np.ones_like(t)], axis=1)
+    dT = np.stack([3 * t ** 2, 2 * t, np.ones_like(t), np.zeros_like(t)], axis=1)
+    windows = get_windows(points, step)
+    positions = (T @ basis) @ windows
+    tangents = (dT @ basis) @ windows
+    return positions.reshape(-1, 3), tangents.reshape(-1, 3)
+
+
+def get_segments(points, kind="bspline"):
+    return max(0, (len(points) - 4) // BASES[kind][1] + 1)
+
+
+def evaluate_at(points, u, kind="bspline"):
+    """Positions and tangents at curve parameters `u`, segment i covers [i, i + 1)."""
+    basis, step = BASES[kind]
+    points = np.asarray(points, dtype=np.float64)
+    segments = get_segments(points, kind)
+    u = np.clip(np.asarray(u, dtype=np.float64), 0, segments)
+    segment = np.minimum(u.astype(int), segments - 1)
+    t = (u - segment)[..., None]
+    T = np.concatenate([t ** 3, t ** 2, t, np.ones_like(t)], axis=-1)
+    dT = np.concatenate([3 * t ** 2, 2 * t, np.ones_like(t), np.zeros_like(t)], axis=-1)
+    windows = get_windows(points, step)[segment]
+    positions = np.einsum("...k,...kd->...d", T @ basis, windows)
+    tangents = np.einsum("...k,...kd->...d", dT @ basis, windows)
+    return positions, tangents
+
+
+def normalize(vectors):
+    lengths = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(lengths > 0, lengths, 1)
+
+
+def rotation_minimizing_frames(positions, tangents, up=(0, 1, 0)):
+    """(N x 3 x 3) frames along a curve, the rows are the unit tangent, normal and binormal.
+
+    The normal starts as close to `up` as it can and is carried along with the double reflection method of
+    Wang et al., so the frame twists as little as possible around the tangent.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    tangents = normalize(np.asarray(tangents, dtype=np.float64))
+    normals = np.empty_like(tangents)
+    up = np.asarray(up, dtype=np.float64)
+    if np.linalg.norm(np.cross(up, tangents[0])) < 1e-6:
+        up = np.eye(3)[np.argmin(np.abs(tangents[0]))]
+    normals[0] = normalize(up - up @ tangents[0] * tangents[0])
+    for i in range(len(positions) - 1):
+        v1 = positions[i + 1] - positions[i]
+        c1 = v1 @ v1
+        if c1 == 0:
+            normals[i + 1] = normals[i]
+            continue
+        normal = normals[i] - 2 / c1 * (v1 @ normals[i]) * v1
+        tangent = tangents[i] - 2 / c1 * (v1 @ tangents[i]) * v1
+        v2 = tangents[i + 1] - tangent
+        c2 = v2 @ v2
+        if c2 > 0:
+            normal = normal - 2 / c2 * (v2 @ normal) * v2
+        normals[i + 1] = normalize(normal - normal @ tangents[i + 1] * tangents[i + 1])
+    return np.stack([tangents, normals, np.cross(tangents, normals)], axis=1)
+
+
+class ArcLength:
+    """Curve positions by distance travelled along it instead of by curve parameter.
+
+    A table of cumulative lengths at `samples` points per segment is searched with a binary search and the curve
+    parameter between two table entries is interpolated linearly, then the curve itself is evaluated there.
+    """
+
+    def __init__(self, points, kind="bspline", samples=64):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.kind = kind
+        self.u = np.arange(get_segments(self.points, kind) * samples + 1) / samples
+        positions, _ = evaluate_at(self.points, self.u, kind)
+        lengths = np.linalg.norm(np.diff(positions, axis=0), axis=1)
+        self.table = np.concatenate([[0], np.cumsum(lengths)])
+        self.length = self.table[-1]
+        self.frames = None
+
+    def wrap(self, distance, mode="clamp"):
+        # "loop" starts over at the end, "bounce" turns around at both ends.
+        distance = np.asarray(distance, dtype=np.float64)
+        if mode == "loop":
+            return distance % self.length
+        if mode == "bounce":
+            distance = distance % (2 * self.length)
+            return np.where(distance > self.length, 2 * self.length - distance, distance)
+        return np.clip(distance, 0, self.length)
+
+    def locate(self, distance, mode="clamp"):
+        # Table entry before the distance and how far it is towards the next one.
+        distance = self.wrap(distance, mode)
+        index = np.clip(np.searchsorted(self.table, distance, side="right") - 1, 0, len(self.table) - 2)
+        start, end = self.table[index], self.table[index + 1]
+        fraction = np.where(end > start, (distance - start) / np.where(end > start, end - start, 1), 0)
+        return index, fraction
+
+    def get_parameter(self, distance, mode="clamp"):
+        index, fraction = self.locate(distance, mode)
+        return self.u[index] + fraction * (self.u[index + 1] - self.u[index])
+
+    def get_frames(self, up=(0, 1, 0)):
+        if self.frames is None:
+            self.frames = rotation_minimizing_frames(*evaluate_at(self.points, self.u, self.kind), up)
+        return self.frames
+
+    def frame(self, distance, mode="clamp"):
+        """Frame at a distance, blended between the two nearest precomputed ones.
+
+        While a bouncing path is travelled backwards the tangent and binormal point the other way, so whatever
+        follows the frame turns around at the ends.
+        """
+        frames = self.get_frames()
+        index, fraction = self.locate(distance, mode)
+        fraction = np.asarray(fraction)[..., None]
+        tangent = normalize(frames[index, 0] * (1 - fraction) + frames[index + 1, 0] * fraction)
+        normal = frames[index, 1] * (1 - fraction) + frames[index + 1, 1] * fraction
+        normal = normalize(normal - np.sum(normal * tangent, axis=-1, keepdims=True) * tangent)
+        if mode == "bounce":
+            backwards = (np.asarray(distance) % (2 * self.length) > self.length)[..., None]
+            tangent = np.where(backwards, -tangent, tangent)
+        return np.stack([tangent, normal, np.cross(tangent, normal)], axis=-2)
+
+    def evaluate(self, distance, mode="clamp"):
+        return evaluate_at(self.points, self.get_parameter(distance, mode), self.kind)
+
+    def position(self, distance, mode="clamp"):
+        return self.evaluate(distance, mode)[0]
+
+    def tangent(self, distance, mode="clamp"):
+        return self.evaluate(distance, mode)[1]